@@ -0,0 +1,17 @@
+// Canonical urls of articles sent by any feed recently, so the same article
+// surfaced by several feeds is only scraped and summarized once
+resource "aws_dynamodb_table" "rss_reader_canonical_urls_table" {
+  name         = "${local.app_id}-RssReaderCanonicalUrls"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "canonical_url"
+
+  attribute {
+    name = "canonical_url"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+}
@@ -0,0 +1,12 @@
+// The feed registry: one item per feed, with the url and optional settings
+// (context, stop_after_seen)
+resource "aws_dynamodb_table" "rss_reader_feeds_table" {
+  name         = "${local.app_id}-RssReaderFeeds"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "url"
+
+  attribute {
+    name = "url"
+    type = "S"
+  }
+}
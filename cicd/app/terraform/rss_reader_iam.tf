@@ -19,6 +19,7 @@ data "aws_iam_policy_document" "rss_reader_assume_policy" {
 data "aws_iam_policy_document" "rss_reader_policy" {
   statement {
     actions = [
+      "dynamodb:BatchGetItem",
       "dynamodb:BatchWriteItem",
       "dynamodb:DeleteItem",
       "dynamodb:DescribeTable",
@@ -36,7 +37,21 @@ data "aws_iam_policy_document" "rss_reader_policy" {
       "sqs:GetQueueUrl",
       "sqs:SendMessage",
     ]
-    resources = ["arn:aws:sqs:*:*:DailyMail-ScraperQueue"]
+    resources = [
+      "arn:aws:sqs:*:*:DailyMail-ScraperQueue",
+      // Entries that carry their full content skip the scraper
+      "arn:aws:sqs:*:*:DailyMail-SummarizerQueue",
+    ]
+  }
+  statement {
+    // Entries that carry their full content skip the scraper
+    actions   = ["s3:PutObject"]
+    resources = ["arn:aws:s3:::skehlet-dailymail-summarizer/*"]
+  }
+  statement {
+    // The scheduled invocation dispatches shards of the feed list to itself
+    actions   = ["lambda:InvokeFunction"]
+    resources = ["arn:aws:lambda:*:*:function:DailyMail-RssReader"]
   }
   statement {
     actions   = ["ssm:GetParameter"]
@@ -13,4 +13,11 @@ resource "aws_dynamodb_table" "rss_reader_processed_ids_table" {
     name = "id"
     type = "S"
   }
+
+  // Rows are written with expires_at = updated_at + 5 years; DynamoDB deletes
+  // them once it passes, so the rss_reader no longer scans for old rows
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
 }
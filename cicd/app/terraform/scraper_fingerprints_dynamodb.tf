@@ -0,0 +1,23 @@
+// SimHash fingerprints of recently scraped content, indexed by band, for
+// dropping near-duplicates (e.g. the same wire story on several sites)
+resource "aws_dynamodb_table" "scraper_fingerprints_table" {
+  name         = "${local.app_id}-ScraperFingerprints"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "band"
+  range_key    = "fingerprint"
+
+  attribute {
+    name = "band"
+    type = "S"
+  }
+
+  attribute {
+    name = "fingerprint"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+}
@@ -21,6 +21,54 @@ data "aws_iam_policy_document" "scraper_policy" {
     actions   = ["s3:PutObject"]
     resources = ["arn:aws:s3:::skehlet-dailymail-summarizer/*"]
   }
+  statement {
+    actions   = ["s3:GetObject"]
+    resources = ["arn:aws:s3:::skehlet-dailymail-summarizer/cache/*"]
+  }
+  statement {
+    actions = [
+      "dynamodb:BatchWriteItem",
+      "dynamodb:GetItem",
+      "dynamodb:PutItem",
+      "dynamodb:Query",
+      "dynamodb:UpdateItem",
+    ]
+    resources = [
+      "arn:aws:dynamodb:*:*:table/DailyMail-ScraperPaywalledDomains",
+      "arn:aws:dynamodb:*:*:table/DailyMail-ScraperFingerprints",
+    ]
+  }
+  statement {
+    // Small scraped records go straight onto the summarizer queue
+    actions = [
+      "sqs:GetQueueUrl",
+      "sqs:SendMessage",
+    ]
+    resources = ["arn:aws:sqs:*:*:DailyMail-SummarizerQueue"]
+  }
+  statement {
+    // Records for busy sites are put back on the queue for a while
+    actions = [
+      "sqs:GetQueueUrl",
+      "sqs:SendMessage",
+    ]
+    resources = ["arn:aws:sqs:*:*:DailyMail-ScraperQueue"]
+  }
+  statement {
+    actions   = ["ssm:GetParameter"]
+    resources = ["arn:aws:ssm:*:*:parameter/DAILY_MAIL_PAYWALL_SIGNATURES"]
+  }
+  # Without ListBucket, reading a missing cache entry is AccessDenied rather
+  # than NoSuchKey
+  statement {
+    actions   = ["s3:ListBucket"]
+    resources = ["arn:aws:s3:::skehlet-dailymail-summarizer"]
+    condition {
+      test     = "StringLike"
+      variable = "s3:prefix"
+      values   = ["cache/*"]
+    }
+  }
 }
 
 resource "aws_iam_role_policy" "scraper_policy" {
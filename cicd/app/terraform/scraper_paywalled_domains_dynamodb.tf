@@ -0,0 +1,12 @@
+// Per domain, how many scrapes found a paywall, so domains that always
+// paywall can be skipped without fetching
+resource "aws_dynamodb_table" "scraper_paywalled_domains_table" {
+  name         = "${local.app_id}-ScraperPaywalledDomains"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "domain"
+
+  attribute {
+    name = "domain"
+    type = "S"
+  }
+}
@@ -19,3 +19,18 @@ resource "aws_s3_bucket_notification" "summarizer_bucket_trigger" {
     filter_prefix = "incoming/"
   }
 }
+
+# The scraper caches its results under cache/ (see SCRAPE_CACHE_DAYS)
+resource "aws_s3_bucket_lifecycle_configuration" "summarizer" {
+  bucket = aws_s3_bucket.summarizer.id
+  rule {
+    id     = "expire-scrape-cache"
+    status = "Enabled"
+    filter {
+      prefix = "cache/"
+    }
+    expiration {
+      days = 7
+    }
+  }
+}
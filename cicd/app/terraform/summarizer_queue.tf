@@ -44,6 +44,7 @@ resource "aws_lambda_event_source_mapping" "summarizer_queue_trigger" {
     # Keeping it at 2 (the minimum) also reduces the long-polling related costs
     maximum_concurrency = 2
   }
+  function_response_types = ["ReportBatchItemFailures"]
 }
 
 resource "aws_sqs_queue" "summarizer_queue_dlq" {
@@ -0,0 +1,21 @@
+import threading
+import boto3
+
+# boto3 resources aren't thread safe (clients are), and the rss_reader and
+# scraper call DynamoDB from thread pools, so each thread gets its own
+# resource, made from its own session
+local = threading.local()
+
+
+def get_dynamodb():
+    if not hasattr(local, "dynamodb"):
+        local.dynamodb = boto3.session.Session().resource("dynamodb")
+        local.tables = {}
+    return local.dynamodb
+
+
+def get_table(name):
+    dynamodb = get_dynamodb()
+    if name not in local.tables:
+        local.tables[name] = dynamodb.Table(name)
+    return local.tables[name]
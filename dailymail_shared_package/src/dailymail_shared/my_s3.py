@@ -1,7 +1,10 @@
 import boto3
 
-s3 = boto3.resource("s3")
+# A client rather than a resource: this is called from thread pools, and only
+# clients are thread safe
+s3 = boto3.client("s3")
 
 
-def write_to_s3(bucket_name, key, data):
-    s3.Bucket(bucket_name).put_object(Key=key, Body=data)
+def write_to_s3(bucket_name, key, data, **kwargs):
+    """Extra kwargs (ContentEncoding, Metadata, ...) are passed on to put_object"""
+    s3.put_object(Bucket=bucket_name, Key=key, Body=data, **kwargs)
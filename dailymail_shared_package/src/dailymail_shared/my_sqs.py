@@ -0,0 +1,13 @@
+import functools
+import boto3
+
+sqs = boto3.client("sqs")
+
+
+@functools.cache
+def get_queue_url(queue_name):
+    return sqs.get_queue_url(QueueName=queue_name)["QueueUrl"]
+
+
+def send_to_sqs(queue_name, body):
+    sqs.send_message(QueueUrl=get_queue_url(queue_name), MessageBody=body)
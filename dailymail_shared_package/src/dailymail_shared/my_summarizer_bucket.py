@@ -0,0 +1,69 @@
+import gzip
+import json
+import uuid
+from dailymail_shared.my_s3 import write_to_s3
+from dailymail_shared.my_sqs import send_to_sqs
+
+# Records are written as gzipped JSON, with Content-Encoding: gzip and this
+# version in their metadata. Objects without a version are plain JSON, as
+# written before records were compressed.
+RECORD_VERSION = 1
+RECORD_VERSION_METADATA_KEY = "record-version"
+# Records small enough are sent on the summarizer queue themselves, in a
+# message of this type, rather than by way of the bucket. SQS allows 256 KiB.
+INLINE_MESSAGE_TYPE = "summarizer_record"
+INLINE_MAX_BYTES = 200 * 1024
+
+
+def encode_record(record):
+    """Returns the body and put_object kwargs for writing a record"""
+    body = gzip.compress(json.dumps(record).encode("utf-8"), compresslevel=6)
+    return (body, {
+        "ContentType": "application/json",
+        "ContentEncoding": "gzip",
+        "Metadata": {RECORD_VERSION_METADATA_KEY: str(RECORD_VERSION)},
+    })
+
+
+def decode_record_body(body, content_encoding=None, metadata=None):
+    """
+    The record's JSON text from an object's body, given its Content-Encoding
+    and metadata as S3 returns them. Reads both compressed and older plain
+    JSON records.
+    """
+    version = int((metadata or {}).get(RECORD_VERSION_METADATA_KEY, "0"))
+    if version > RECORD_VERSION:
+        raise Exception(f"Record version {version} is newer than this code understands ({RECORD_VERSION})")
+    if content_encoding == "gzip":
+        body = gzip.decompress(body)
+    return body.decode("utf-8")
+
+
+def write_to_summarizer_bucket(bucket_name, record):
+    """
+    Write a record that already has its title and content to the summarizer
+    bucket's incoming/ prefix, which triggers the summarizer. Used by the
+    scraper, and by the rss_reader for entries that carry their full content.
+    """
+    key = f"incoming/{uuid.uuid4()}"
+    (body, put_kwargs) = encode_record(record)
+    write_to_s3(bucket_name, key, body, **put_kwargs)
+    return key
+
+
+def send_to_summarizer(bucket_name, queue_name, record, inline_max_bytes=INLINE_MAX_BYTES):
+    """
+    Send a record that already has its title and content to the summarizer:
+    directly on its queue if it fits in a message of inline_max_bytes,
+    otherwise by writing it to the bucket (whose incoming/ notifications go
+    to the same queue). Returns where it went.
+    """
+    message = json.dumps({
+        "type": INLINE_MESSAGE_TYPE,
+        "version": RECORD_VERSION,
+        "record": record,
+    })
+    if len(message.encode("utf-8")) <= inline_max_bytes:
+        send_to_sqs(queue_name, message)
+        return queue_name
+    return f"{bucket_name}/{write_to_summarizer_bucket(bucket_name, record)}"
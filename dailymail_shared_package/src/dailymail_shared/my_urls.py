@@ -0,0 +1,91 @@
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+# (host, path) of known redirectors, and the query parameter holding the real url
+REDIRECTORS = {
+    ("www.google.com", "/url"): ("url", "q"),
+    ("google.com", "/url"): ("url", "q"),
+    ("l.facebook.com", "/l.php"): ("u",),
+    ("lm.facebook.com", "/l.php"): ("u",),
+    ("t.umblr.com", "/redirect"): ("z",),
+    ("href.li", "/"): (),
+}
+
+# Query parameters that only exist for tracking, and never change the article
+TRACKING_PARAM_PREFIXES = ("utm_", "mc_", "pk_", "hsa_")
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "twclid",
+    "_hsenc", "_hsmi", "mkt_tok", "ref", "ref_src", "ref_url", "cmpid",
+    "ocid", "smid", "sr_share", "at_medium", "at_campaign", "guccounter",
+    "s_cid", "ito", "taid",
+}
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def remove_redirectors_from_url(url, max_depth=3):
+    """
+    For example:
+    https://www.google.com/url?rct=j&sa=t&url=https://www.caranddriver.com/news/a46717089/vw-id-buzz-super-bowl-ad-sale-date/&ct=ga&cd=CAEYACoUMTMxODg2NDY3Mzc0MzM4Mzc1OTMyGjUwNWZiNzdjNjQ5ODI4MzI6Y29tOmVuOlVT&usg=AOvVaw28L7Vbwdv_m3WH6gCBCnK8
+    Extract out that `url` part of the query string, and return it.
+    Handles the redirectors in REDIRECTORS, nested up to max_depth deep.
+    """
+    for _ in range(max_depth):
+        parsed = urlparse(url)
+        host = (parsed.hostname or "").lower()
+        if (host, parsed.path) not in REDIRECTORS:
+            return url
+        params = REDIRECTORS[(host, parsed.path)]
+        if not params:
+            # e.g. href.li puts the target url after the '?'
+            target = parsed.query
+        else:
+            query = dict(parse_qsl(parsed.query))
+            target = next((query[p] for p in params if query.get(p)), None)
+        if not target or not target.startswith(("http://", "https://")):
+            return url
+        url = target
+    return url
+
+
+def canonicalize_url(url):
+    """
+    Return a canonical form of the url, for recognizing the same article
+    reached by different urls: unwrap known redirectors, drop tracking query
+    parameters and the fragment, and normalize the scheme, host, port and path.
+    The result is meant to be used as a key, not fetched.
+    """
+    parsed = urlparse(remove_redirectors_from_url(url.strip()))
+
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or "").lower().rstrip(".")
+    if host.startswith("www."):
+        host = host[4:]
+    netloc = host
+    if parsed.port and parsed.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{parsed.port}"
+    if scheme == "http":
+        # almost every site serves the same article over https
+        scheme = "https"
+
+    path = parsed.path or "/"
+    while "//" in path:
+        path = path.replace("//", "/")
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    query = sorted(
+        (key, value)
+        for (key, value) in parse_qsl(parsed.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS
+        and not key.lower().startswith(TRACKING_PARAM_PREFIXES)
+    )
+
+    return urlunparse((scheme, netloc, path, "", urlencode(query), ""))
+
+
+def get_domain(url):
+    """The url's host, lowercased and without any leading www."""
+    host = (urlparse(url).hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return host
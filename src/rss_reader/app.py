@@ -1,80 +1,273 @@
+import calendar
+import hashlib
+import http.client
 import json
-from urllib.parse import urlparse, parse_qs
+import sys
+import threading
+import time
+import traceback
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
 import feedparser
-from app_settings import RSS_FEEDS_PARAMETER_NAME, SCRAPER_QUEUE
+from app_settings import (
+    RSS_FEEDS_PARAMETER_NAME,
+    SCRAPER_QUEUE,
+    SUMMARIZER_BUCKET,
+    SUMMARIZER_QUEUE,
+    SUMMARIZER_INLINE_MAX_BYTES,
+    FEED_FETCH_WORKERS,
+    FEED_FETCH_MAX_PER_HOST,
+    RSS_FEEDS_PER_SHARD,
+)
 from db import (
+    get_feed_registry,
     get_feed_metadata,
     store_feed_metadata,
-    id_already_processed,
-    mark_id_as_processed,
-    cleanup_processed_ids,
+    get_processed_ids,
+    mark_ids_as_processed,
+    get_seen_canonical_urls,
+    claim_canonical_url,
+    release_canonical_urls,
 )
-from app_queue import enqueue
+from app_queue import enqueue_batch, SEND_MESSAGE_BATCH_MAX
+from entry_content import get_full_content_text
+from feed_fetch import fetch_feed
+from scheduler import is_feed_due, schedule_next_poll
 import boto3
+from dailymail_shared.my_summarizer_bucket import send_to_summarizer
+from dailymail_shared.my_urls import remove_redirectors_from_url, canonicalize_url
 
+# Per-host semaphores, so concurrent fetches don't pile onto a single origin
+host_semaphores = {}
+host_semaphores_lock = threading.Lock()
+
+
+def read_rss_feeds(force_poll=False, function_name=None):
+    """
+    Read all feeds. If there are more than RSS_FEEDS_PER_SHARD of them and we
+    know our own function name, act as the dispatcher: split the feeds into
+    shards and invoke a worker (this same function, asynchronously) per shard.
+    """
+    feeds = get_rss_feeds()
+    shards = split_into_shards(feeds)
+    if len(shards) <= 1 or not function_name:
+        read_feeds_concurrently(feeds, force_poll)
+    else:
+        dispatch_shards(function_name, shards, force_poll)
 
-def read_rss_feeds():
-    for feed_config in get_rss_feeds():
-        if isinstance(feed_config, str):
-            feed_url = feed_config
-            feed_context = None
-        else:
-            feed_url = feed_config["url"]
-            feed_context = feed_config.get("context")
-        read_feed(feed_url, feed_context)
-    cleanup_processed_ids()
+
+def read_rss_feed_shard(feeds, force_poll=False):
+    """Worker mode: read just the feeds the dispatcher handed us"""
+    print(f"Reading shard of {len(feeds)} feeds")
+    read_feeds_concurrently(feeds, force_poll)
+
+
+def split_into_shards(feeds):
+    # Sort by url so feeds from the same host tend to land in the same shard,
+    # where they share that worker's per-host limit
+    feeds = sorted(feeds, key=lambda feed_config: feed_config["url"])
+    return [
+        feeds[i:i + RSS_FEEDS_PER_SHARD]
+        for i in range(0, len(feeds), RSS_FEEDS_PER_SHARD)
+    ]
+
+
+def dispatch_shards(function_name, shards, force_poll=False):
+    lambda_client = boto3.client("lambda")
+    for (i, shard) in enumerate(shards):
+        lambda_client.invoke(
+            FunctionName=function_name,
+            InvocationType="Event",
+            Payload=json.dumps({"feeds": shard, "force_poll": force_poll}),
+        )
+        print(f"Dispatched shard {i + 1} of {len(shards)} ({len(shard)} feeds) to {function_name}")
+
+
+def read_feeds_concurrently(feeds, force_poll=False):
+    """
+    Read all feeds using a pool of FEED_FETCH_WORKERS threads, so the total run
+    time tracks the slowest feed rather than the sum of all of them. A failure
+    in one feed doesn't stop the others; failures are raised at the end.
+    Feeds that aren't due yet are skipped unless force_poll is set.
+    """
+    start_time = time.time()
+    failed = []
+    with ThreadPoolExecutor(max_workers=FEED_FETCH_WORKERS) as executor:
+        futures = {
+            executor.submit(
+                read_feed,
+                feed_config["url"],
+                feed_config.get("context"),
+                feed_config.get("stop_after_seen"),
+                force_poll,
+            ): feed_config["url"]
+            for feed_config in feeds
+        }
+        for future in as_completed(futures):
+            feed_url = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Exception reading feed {feed_url}: {e}")
+                print("=== BEGIN stack trace ===")
+                print("".join(traceback.format_exception(e)))
+                print("=== END stack trace ===")
+                failed.append(feed_url)
+    end_time = time.time()
+    print(f"Reading {len(feeds)} feeds took {(end_time - start_time):0.1f} seconds")
+
+    if failed:
+        raise Exception(f"Failed to read {len(failed)} of {len(feeds)} feeds: {failed}")
+
+
+def get_host_semaphore(feed_url):
+    host = urlparse(feed_url).hostname
+    with host_semaphores_lock:
+        if host not in host_semaphores:
+            host_semaphores[host] = threading.BoundedSemaphore(FEED_FETCH_MAX_PER_HOST)
+        return host_semaphores[host]
 
 
 def get_rss_feeds():
-    # fetch the list of rss feeds from AWS parameter store
+    """
+    Return the list of feed configs, each a dict with the url and optional
+    settings: context, stop_after_seen. Feeds live in the
+    DailyMail-RssReaderFeeds table; until that has been populated (see
+    misc/migrate_rss_feeds_to_table.py), fall back to the parameter store.
+    """
+    feeds = get_feed_registry()
+    if feeds:
+        return feeds
+
+    print(f"Feed registry is empty, reading feeds from {RSS_FEEDS_PARAMETER_NAME}")
     ssm = boto3.client("ssm")
     parameter = ssm.get_parameter(Name=RSS_FEEDS_PARAMETER_NAME)
-    return json.loads(parameter["Parameter"]["Value"])
+    feeds = []
+    for feed_config in json.loads(parameter["Parameter"]["Value"]):
+        # A feed is either just its url, or a dict with the url and settings
+        if isinstance(feed_config, str):
+            feed_config = {"url": feed_config}
+        feeds.append(feed_config)
+    return feeds
 
 
-def read_feed(feed_url, feed_context=None):
+def read_feed(feed_url, feed_context=None, stop_after_seen=None, force_poll=False):
     print(f"URL: {feed_url}")
-    (previous_etag, previous_last_modified) = get_feed_metadata(feed_url)
+    previous_metadata = get_feed_metadata(feed_url)
+
+    now = int(time.time())
+    if not force_poll and not is_feed_due(previous_metadata, now):
+        print(f"Feed not due until {previous_metadata['next_poll_at']}, skipping")
+        return
+
+    previous_etag = previous_metadata.get("etag")
+    previous_last_modified = previous_metadata.get("last_modified")
+    previous_content_hash = previous_metadata.get("content_hash")
     print(f"Previous Etag: {previous_etag}")
     print(f"Previous Last modified: {previous_last_modified}")
+    print(f"Previous Content hash: {previous_content_hash}")
 
-    d = feedparser.parse(
-        feed_url,
-        etag=previous_etag,
-        modified=previous_last_modified,
-    )
+    # Fetch the raw bytes ourselves (rather than letting feedparser do it), so
+    # we can enforce a deadline and hash the content
+    with get_host_semaphore(feed_url):
+        start_time = time.time()
+        try:
+            (status, headers, body) = fetch_feed(feed_url, previous_etag, previous_last_modified)
+        except (OSError, EOFError, zlib.error, http.client.HTTPException) as e:
+            # e.g. URLError, timeouts, connection resets, a body cut short
+            # (IncompleteRead) or that won't decompress
+            print(f"Error fetching {feed_url}, just skipping this feed for now: {e!r}")
+            return
+        end_time = time.time()
+    print(f"Fetching {feed_url} took {(end_time - start_time):0.1f} seconds")
 
-    # I've had AttributeErrors where status is missing (network issue? unknown network problem?). Check and handle. 
-    if not hasattr(d, "status"):
-        print("No status attribute in feedparser response, not sure why, just skipping this feed for now")
+    print(f"Status: {status}")
+    if status != 304 and body is None:
+        print(f"Unexpected status {status}, just skipping this feed for now")
         return
 
-    print(f"Status: {d.status}")
-    if "etag" in d:
-        etag = d.etag
-        print(f"Etag: {etag}")
+    metadata = dict(previous_metadata)
+    new_entries = 0
+    if status == 304:
+        print("Feed not modified, skipping")
     else:
-        etag = None
-    if "modified" in d:
-        last_modified = d.modified
-        print(f"Last modified: {last_modified}")
-    else:
-        last_modified = None
-    feed_title = d.feed.get("title", "Unknown")
-    feed_description = d.feed.get("description", "Unknown")
+        etag = headers.get("etag")
+        if etag:
+            print(f"Etag: {etag}")
+        last_modified = headers.get("last-modified")
+        if last_modified:
+            print(f"Last modified: {last_modified}")
+
+        # Note Google Alerts does NOT provide either ETag nor Last-Modified, so for
+        # feeds like that, the content hash is what tells us nothing has changed.
+        content_hash = hashlib.sha256(body).hexdigest()
+        print(f"Content hash: {content_hash}")
 
-    print(f"Feed title: {feed_title}")
-    print(f"Feed description: {feed_description}")
-    print(f"Feed published: {d.feed.get('published', 'Unknown')}")
+        metadata["etag"] = etag
+        metadata["last_modified"] = last_modified
+        metadata["content_hash"] = content_hash
 
-    process_rss_entries(feed_url, feed_title, feed_description, feed_context, d.entries)
+        if content_hash == previous_content_hash:
+            print("Feed content unchanged since last run, skipping")
+        else:
+            d = feedparser.parse(body, response_headers=headers)
 
-    # Note Google Alerts does NOT provide either ETag nor Last-Modified
-    if etag != previous_etag or last_modified != previous_last_modified:
-        store_feed_metadata(feed_url, etag, last_modified)
+            feed_title = d.feed.get("title", "Unknown")
+            feed_description = d.feed.get("description", "Unknown")
 
+            print(f"Feed title: {feed_title}")
+            print(f"Feed description: {feed_description}")
+            print(f"Feed published: {d.feed.get('published', 'Unknown')}")
 
-def process_rss_entries(url, feed_title, feed_description, feed_context, entries):
+            (new_entries, (metadata["newest_published"], metadata["newest_id"])) = process_rss_entries(
+                feed_url,
+                feed_title,
+                feed_description,
+                feed_context,
+                d.entries,
+                stop_after_seen,
+                (previous_metadata.get("newest_published"), previous_metadata.get("newest_id")),
+            )
+
+    metadata.update(schedule_next_poll(previous_metadata, now, new_entries > 0))
+    print(f"New entries: {new_entries}, next poll in {metadata['poll_interval']} seconds")
+
+    changed = {k: v for (k, v) in metadata.items() if v != previous_metadata.get(k)}
+    if changed:
+        store_feed_metadata(feed_url, **changed)
+
+
+def process_rss_entries(
+    url,
+    feed_title,
+    feed_description,
+    feed_context,
+    entries,
+    stop_after_seen=None,
+    high_water_mark=(None, None),
+):
+    """
+    Send the feed's new entries to the scraper queue (or, when an entry already
+    carries the full article, straight to the summarizer).
+
+    If stop_after_seen is set, entries are walked in feed order (most feeds
+    list the newest first) and looked up a chunk at a time, stopping once
+    stop_after_seen consecutive entries have already been seen. In that mode
+    the high-water mark (newest published timestamp and its id, from earlier
+    runs) also counts as seen any entry that is that same entry or was
+    published before it, without looking it up.
+
+    Entries whose canonical url has already been sent recently, by this or any
+    other feed, are marked as processed but not sent again. Feeds are read
+    concurrently, so each canonical url is claimed (see claim_canonical_url)
+    before it's sent, and only the feed that wins the claim sends it.
+
+    Returns the number of new entries sent, and the updated high-water mark.
+    """
+    (newest_published, newest_id) = high_water_mark
+
+    candidates = []
     for entry in entries:
         if "link" not in entry:
             print("Skipping entry without link")
@@ -87,60 +280,172 @@ def process_rss_entries(url, feed_title, feed_description, feed_context, entries
         else:
             article_id = article_url
 
-        if id_already_processed(url, article_id):
-            print(f"Already seen {url}/{article_id}")
-            continue
+        candidates.append((
+            entry,
+            article_url,
+            article_id,
+            canonicalize_url(article_url),
+            get_entry_published_timestamp(entry),
+        ))
 
-        article_title = entry.title
-        article_description = entry.description
-        article_published = entry.published
-        article_content = entry.summary
-
-        print(f"=== {article_id}")
-        print(f"Title: {article_title}")
-        print(f"URL: {article_url}")
-        # print(f"Description: {article_description}")
-        print(f"Published: {article_published}")
-        # print(f"Content: {article_content}")
-        print("")
-
-        record = {
-            "type": "rss_entry",
-            "feed_title": feed_title,
-            "feed_description": feed_description,
-            "feed_context": feed_context,
-            "title": article_title,
-            "url": article_url,
-            "description": article_description,
-            "published": article_published,
-        }
-        write_to_queue(record)
+    def below_high_water_mark(article_id, published):
+        if not stop_after_seen or newest_published is None:
+            return False
+        return article_id == newest_id or (published is not None and published < newest_published)
 
-        mark_id_as_processed(url, article_id)
+    # Without stop_after_seen, look up the whole feed's entries at once, rather
+    # than one get_item per entry
+    chunk_size = stop_after_seen or len(candidates) or 1
 
+    already_processed = set()
+    seen_canonical_urls = set()
+    pending = []
+    new_entries = 0
+    consecutive_seen = 0
+    new_newest = (newest_published, newest_id)
+    # Claims on canonical urls that haven't been handed to write_entries yet
+    unwritten_claims = []
+    try:
+        for chunk_start in range(0, len(candidates), chunk_size):
+            chunk = candidates[chunk_start:chunk_start + chunk_size]
+            already_processed |= get_processed_ids([
+                (url, article_id)
+                for (_, _, article_id, _, published) in chunk
+                if not below_high_water_mark(article_id, published)
+            ])
+            # Other feeds (e.g. overlapping Google Alerts) may have already sent the same article
+            seen_canonical_urls |= get_seen_canonical_urls(url, [
+                (article_id, canonical_url)
+                for (_, _, article_id, canonical_url, published) in chunk
+                if (url, article_id) not in already_processed
+                and not below_high_water_mark(article_id, published)
+            ])
 
-def remove_redirectors_from_url(url):
-    """
-    For example:
-    https://www.google.com/url?rct=j&sa=t&url=https://www.caranddriver.com/news/a46717089/vw-id-buzz-super-bowl-ad-sale-date/&ct=ga&cd=CAEYACoUMTMxODg2NDY3Mzc0MzM4Mzc1OTMyGjUwNWZiNzdjNjQ5ODI4MzI6Y29tOmVuOlVT&usg=AOvVaw28L7Vbwdv_m3WH6gCBCnK8
-    Extract out that `url` part of the query string, and return it
-    """
-    if url.startswith("https://www.google.com/url?"):
-        return parse_qs(urlparse(url).query)["url"][0]
-    else:
-        return url
+            for (entry, article_url, article_id, canonical_url, published) in chunk:
+                if published is not None and (new_newest[0] is None or published > new_newest[0]):
+                    new_newest = (published, article_id)
 
+                if (url, article_id) in already_processed or below_high_water_mark(article_id, published):
+                    print(f"Already seen {url}/{article_id}")
+                    consecutive_seen += 1
+                    if stop_after_seen and consecutive_seen >= stop_after_seen:
+                        break
+                    continue
+                consecutive_seen = 0
+                # Some feeds repeat an entry; only process the first one
+                already_processed.add((url, article_id))
 
-def write_to_queue(entry):
-    enqueue(SCRAPER_QUEUE, json.dumps(entry))
+                # The lookup above skips most duplicates cheaply, the claim settles
+                # races with feeds being read at the same time
+                if canonical_url in seen_canonical_urls or not claim_canonical_url(url, article_id, canonical_url):
+                    print(f"Already sent {canonical_url} from another entry, skipping {url}/{article_id}")
+                    seen_canonical_urls.add(canonical_url)
+                    # nothing to send, but still mark the id as processed
+                    pending.append((article_id, None))
+                    continue
+                seen_canonical_urls.add(canonical_url)
+                unwritten_claims.append((article_id, canonical_url))
+
+                article_title = entry.title
+                article_description = entry.description
+                article_published = entry.published
+                article_content = entry.summary
+
+                print(f"=== {article_id}")
+                print(f"Title: {article_title}")
+                print(f"URL: {article_url}")
+                # print(f"Description: {article_description}")
+                print(f"Published: {article_published}")
+                # print(f"Content: {article_content}")
+                print("")
+
+                record = {
+                    "type": "rss_entry",
+                    "feed_title": feed_title,
+                    "feed_description": feed_description,
+                    "feed_context": feed_context,
+                    "title": article_title,
+                    "url": article_url,
+                    "canonical_url": canonical_url,
+                    "description": article_description,
+                    "published": article_published,
+                }
+
+                # If the feed already gave us the whole article, there's no need to scrape it
+                full_content = get_full_content_text(entry)
+                if full_content:
+                    print(f"Entry carries its full content ({len(full_content)} chars), skipping the scraper")
+                    record["content"] = full_content
+
+                pending.append((article_id, record))
+                if len(pending) >= SEND_MESSAGE_BATCH_MAX:
+                    # write_entries releases whatever of these it fails to send
+                    unwritten_claims = []
+                    new_entries += write_entries(url, pending)
+                    pending = []
+
+            if stop_after_seen and consecutive_seen >= stop_after_seen:
+                print(f"Stopping after {consecutive_seen} consecutive already seen entries")
+                break
+
+        unwritten_claims = []
+        new_entries += write_entries(url, pending)
+    finally:
+        # Something went wrong before these were sent: let a later run send them
+        release_canonical_urls(url, unwritten_claims)
+
+    return (new_entries, new_newest)
+
+
+def get_entry_published_timestamp(entry):
+    """Return the entry's published (or else updated) time as epoch seconds, or None"""
+    for field in ("published_parsed", "updated_parsed"):
+        if entry.get(field):
+            return calendar.timegm(entry[field])
+    return None
+
+
+def write_entries(url, pending):
+    """
+    Send the pending (article_id, record) pairs on their way: records that
+    already carry their content go straight to the summarizer, the rest
+    go to the scraper queue in batches (a record of None is a duplicate with
+    nothing to send). Then mark only the ids that were accepted as processed,
+    so anything that failed is picked up again on the next run, and release
+    the claims on the canonical urls that weren't sent.
+
+    Returns the number of records sent.
+    """
+    if not pending:
+        return 0
+    to_scrape = [(article_id, record) for (article_id, record) in pending if record and "content" not in record]
+    accepted = []
+    try:
+        for (article_id, record) in pending:
+            if record is None or "content" in record:
+                if record:
+                    send_to_summarizer(SUMMARIZER_BUCKET, SUMMARIZER_QUEUE, record, SUMMARIZER_INLINE_MAX_BYTES)
+                accepted.append((article_id, record))
+        accepted_indexes = enqueue_batch(SCRAPER_QUEUE, [json.dumps(record) for (_, record) in to_scrape])
+        accepted.extend(to_scrape[i] for i in sorted(accepted_indexes))
+    finally:
+        mark_ids_as_processed([(url, article_id) for (article_id, _) in accepted])
+        accepted_records = [record for (_, record) in accepted]
+        release_canonical_urls(url, [
+            (article_id, record["canonical_url"])
+            for (article_id, record) in pending
+            if record and record not in accepted_records
+        ])
+    if len(accepted) < len(pending):
+        raise Exception(f"Failed to send {len(pending) - len(accepted)} of {len(pending)} entries for {url}")
+    return sum(1 for (_, record) in accepted if record)
 
 
 if __name__ == "__main__":
-    read_rss_feeds()
+    read_rss_feeds(force_poll="--force" in sys.argv)
     # from db import (
     #     add_updated_at_field_where_missing,
     #     clear_updated_at_fields,
     # )
     # # clear_updated_at_fields()
     # # add_updated_at_field_where_missing()
-    # cleanup_processed_ids()
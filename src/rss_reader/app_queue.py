@@ -1,7 +1,41 @@
+import time
 import boto3
+from dailymail_shared.my_sqs import get_queue_url
 
 sqs = boto3.client('sqs')
 
-def enqueue(queue_name, obj):
-    queue_url = sqs.get_queue_url(QueueName=queue_name)['QueueUrl']
-    sqs.send_message(QueueUrl=queue_url, MessageBody=obj)
+SEND_MESSAGE_BATCH_MAX = 10  # SQS's limit per SendMessageBatch request
+SEND_MESSAGE_BATCH_MAX_RETRIES = 5
+
+
+def enqueue_batch(queue_name, objs):
+    """
+    Send objs to the queue using SendMessageBatch, 10 at a time. Entries that
+    fail for reasons other than a sender fault are retried with backoff.
+    Returns the set of indexes into objs that SQS accepted.
+    """
+    queue_url = get_queue_url(queue_name)
+    accepted = set()
+    for i in range(0, len(objs), SEND_MESSAGE_BATCH_MAX):
+        pending = {str(j): objs[j] for j in range(i, min(i + SEND_MESSAGE_BATCH_MAX, len(objs)))}
+        retries = 0
+        while pending:
+            response = sqs.send_message_batch(
+                QueueUrl=queue_url,
+                Entries=[{"Id": id, "MessageBody": body} for (id, body) in pending.items()],
+            )
+            for success in response.get("Successful", []):
+                accepted.add(int(success["Id"]))
+                del pending[success["Id"]]
+            for failure in response.get("Failed", []):
+                print(f"SendMessageBatch failed for entry {failure['Id']}: {failure.get('Code')} - {failure.get('Message')}")
+                if failure.get("SenderFault"):
+                    # retrying won't help
+                    del pending[failure["Id"]]
+            if pending:
+                if retries >= SEND_MESSAGE_BATCH_MAX_RETRIES:
+                    print(f"Giving up on {len(pending)} messages after {retries} retries")
+                    break
+                time.sleep(min(0.1 * 2**retries, 5))
+                retries += 1
+    return accepted
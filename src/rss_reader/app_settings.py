@@ -3,9 +3,60 @@ import os
 PIPELINE_EXECUTION_ID = os.environ.get("PIPELINE_EXECUTION_ID", "Unknown")
 RSS_FEEDS_PARAMETER_NAME = "DAILY_MAIL_RSS_FEEDS"
 SCRAPER_QUEUE = "DailyMail-ScraperQueue"
+SUMMARIZER_BUCKET = os.environ.get("SUMMARIZER_BUCKET", "skehlet-dailymail-summarizer")
+# Entries whose content looks like the full article skip the scraper and are
+# sent straight to the summarizer: on its queue if they're no bigger than
+# SUMMARIZER_INLINE_MAX_BYTES, otherwise by way of its bucket
+SUMMARIZER_QUEUE = "DailyMail-SummarizerQueue"
+SUMMARIZER_INLINE_MAX_BYTES = int(os.environ.get("SUMMARIZER_INLINE_MAX_BYTES", str(200 * 1024)))
+FULL_CONTENT_MIN_CHARS = int(os.environ.get("FULL_CONTENT_MIN_CHARS", "1500"))
+FULL_CONTENT_MIN_PARAGRAPHS = int(os.environ.get("FULL_CONTENT_MIN_PARAGRAPHS", "3"))
+# Content containing any of these is a paywalled preview, not the full article,
+# so it goes to the scraper like any other entry (which drops it as paywalled).
+# The first two are the scraper's PAYWALL_TEXTS.
+FULL_CONTENT_TRUNCATION_TEXTS = [
+    "This post is for paid subscribers",
+    "This post is for paying subscribers only",
+    "Keep reading with a 7-day free trial",
+    "Keep reading with a free trial",
+    "Subscribe to keep reading",
+]
+# Above this many feeds, the scheduled invocation dispatches the feeds in shards
+# of this size to parallel invocations of itself
+RSS_FEEDS_PER_SHARD = int(os.environ.get("RSS_FEEDS_PER_SHARD", "50"))
+# The same article (by canonical url) isn't sent again within this many days, by any feed
+CANONICAL_URL_DEDUP_DAYS = int(os.environ.get("CANONICAL_URL_DEDUP_DAYS", "14"))
+# Feeds are fetched concurrently. Limit how many feeds are in flight overall,
+# how many hit the same host at once, and how long fetching a single feed may
+# take (roughly: see feed_fetch.fetch_feed).
+FEED_FETCH_WORKERS = int(os.environ.get("FEED_FETCH_WORKERS", "8"))
+FEED_FETCH_MAX_PER_HOST = int(os.environ.get("FEED_FETCH_MAX_PER_HOST", "2"))
+FEED_FETCH_TIMEOUT_SECS = int(os.environ.get("FEED_FETCH_TIMEOUT_SECS", "30"))
+# Quiet feeds are polled less often: each poll without new entries doubles the
+# feed's interval, up to the max. The min matches the daily cron schedule.
+POLL_MIN_INTERVAL_SECS = int(os.environ.get("POLL_MIN_INTERVAL_SECS", str(24 * 60 * 60)))
+POLL_MAX_INTERVAL_SECS = int(os.environ.get("POLL_MAX_INTERVAL_SECS", str(8 * 24 * 60 * 60)))
+POLL_DUE_SLACK_SECS = int(os.environ.get("POLL_DUE_SLACK_SECS", str(60 * 60)))
+# Poll every feed regardless of its schedule (also settable per invocation with {"force_poll": true})
+FORCE_FULL_POLL = os.environ.get("FORCE_FULL_POLL", "false").lower() == "true"
 
 
 def show_settings():
     print(f"{PIPELINE_EXECUTION_ID=}")
     print(f"{RSS_FEEDS_PARAMETER_NAME=}")
-    print(f"{SCRAPER_QUEUE=}")
\ No newline at end of file
+    print(f"{SCRAPER_QUEUE=}")
+    print(f"{SUMMARIZER_BUCKET=}")
+    print(f"{SUMMARIZER_QUEUE=}")
+    print(f"{SUMMARIZER_INLINE_MAX_BYTES=}")
+    print(f"{FULL_CONTENT_MIN_CHARS=}")
+    print(f"{FULL_CONTENT_MIN_PARAGRAPHS=}")
+    print(f"{FULL_CONTENT_TRUNCATION_TEXTS=}")
+    print(f"{RSS_FEEDS_PER_SHARD=}")
+    print(f"{CANONICAL_URL_DEDUP_DAYS=}")
+    print(f"{FEED_FETCH_WORKERS=}")
+    print(f"{FEED_FETCH_MAX_PER_HOST=}")
+    print(f"{FEED_FETCH_TIMEOUT_SECS=}")
+    print(f"{POLL_MIN_INTERVAL_SECS=}")
+    print(f"{POLL_MAX_INTERVAL_SECS=}")
+    print(f"{POLL_DUE_SLACK_SECS=}")
+    print(f"{FORCE_FULL_POLL=}")
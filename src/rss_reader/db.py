@@ -1,29 +1,81 @@
 import time
-import boto3
+from decimal import Decimal
 from botocore.exceptions import ClientError
 from boto3.dynamodb.conditions import Attr
+from dailymail_shared.my_dynamodb import get_dynamodb, get_table
+from app_settings import CANONICAL_URL_DEDUP_DAYS
 
-dynamodb = boto3.resource("dynamodb")
-feed_metadata_table = dynamodb.Table("DailyMail-RssReaderFeedMetadata")
-processed_ids_table = dynamodb.Table("DailyMail-RssReaderProcessedIds")
+# Feeds are read from a thread pool, so tables are looked up per thread (see
+# get_table) rather than shared
+FEED_METADATA_TABLE = "DailyMail-RssReaderFeedMetadata"
+PROCESSED_IDS_TABLE = "DailyMail-RssReaderProcessedIds"
+FEEDS_TABLE = "DailyMail-RssReaderFeeds"
+CANONICAL_URLS_TABLE = "DailyMail-RssReaderCanonicalUrls"
 
+# Processed ids carry an expires_at attribute, and DynamoDB's TTL deletes them
+# for us once it passes. See misc/backfill_processed_ids_ttl.py for older rows.
 CLEANUP_AFTER_SECS = 5 * 365 * 24 * 60 * 60  # 5 years
+CANONICAL_URL_DEDUP_SECS = CANONICAL_URL_DEDUP_DAYS * 24 * 60 * 60
+# String fields are stored wrapped in {"S": ...} maps
+FEED_METADATA_STRING_FIELDS = ("etag", "last_modified", "content_hash", "newest_id")
+FEED_METADATA_NUMBER_FIELDS = (
+    "newest_published",
+    "last_polled_at",
+    "last_changed_at",
+    "poll_interval",
+    "next_poll_at",
+)
+BATCH_GET_MAX_KEYS = 100  # DynamoDB's limit per BatchGetItem request
+BATCH_MAX_RETRIES = 8
 
 
-def get_feed_metadata(url):
+def get_feed_registry():
+    """
+    Return all feed configs in the feed registry table, each a dict with the
+    url and any optional settings (context, stop_after_seen).
+    """
+    feeds = []
     try:
-        response = feed_metadata_table.get_item(Key={"url": url})
+        scan_params = {}
+        while True:
+            response = get_table(FEEDS_TABLE).scan(**scan_params)
+            for item in response.get("Items", []):
+                # numbers come back as Decimals, which json.dumps can't handle
+                feeds.append({
+                    k: int(v) if isinstance(v, Decimal) else v
+                    for (k, v) in item.items()
+                })
+            if "LastEvaluatedKey" not in response:
+                return feeds
+            scan_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    except ClientError as e:
+        error_code = e.response["Error"]["Code"]
+        error_message = e.response["Error"]["Message"]
+        print(f"DynamoDB error reading the feed registry: {error_code} - {error_message}")
+        raise e
+
+
+def get_feed_metadata(url) -> dict:
+    """
+    Return the stored metadata for the feed (empty if there is none). Keys:
+    etag, last_modified, content_hash, newest_published, newest_id, and the
+    poll history: last_polled_at, last_changed_at, poll_interval, next_poll_at
+    """
+    try:
+        response = get_table(FEED_METADATA_TABLE).get_item(Key={"url": url})
         if "Item" not in response:
             # print(f"URL {url}: no metadata found")
-            return (None, None)
-        etag = ""
-        last_modified = ""
-        if "etag" in response["Item"]:
-            etag = response["Item"]["etag"]["S"]
-        if "last_modified" in response["Item"]:
-            last_modified = response["Item"]["last_modified"]["S"]
-        # print(f"URL {url} metadata: etag: {etag}, last_modified: {last_modified}")
-        return (etag, last_modified)
+            return {}
+        item = response["Item"]
+        metadata = {}
+        for field in FEED_METADATA_STRING_FIELDS:
+            if field in item:
+                metadata[field] = item[field]["S"]
+        for field in FEED_METADATA_NUMBER_FIELDS:
+            if field in item:
+                metadata[field] = int(item[field])
+        # print(f"URL {url} metadata: {metadata}")
+        return metadata
     except ClientError as e:
         error_code = e.response["Error"]["Code"]
         error_message = e.response["Error"]["Message"]
@@ -33,21 +85,26 @@ def get_feed_metadata(url):
         raise e
 
 
-def store_feed_metadata(url, etag, last_modified):
+def store_feed_metadata(url, **fields):
+    """
+    Update just the given metadata fields for the feed (see get_feed_metadata)
+    """
     now = int(time.time())
+    values = {":updated_at": now}
+    for (field, value) in fields.items():
+        if field in FEED_METADATA_STRING_FIELDS:
+            values[f":{field}"] = {"S": value}
+        elif field in FEED_METADATA_NUMBER_FIELDS:
+            values[f":{field}"] = value
+        else:
+            raise Exception(f"Unknown feed metadata field: {field}")
     try:
-        feed_metadata_table.update_item(
+        get_table(FEED_METADATA_TABLE).update_item(
             Key={"url": url},
-            UpdateExpression="SET etag = :etag, last_modified = :last_modified, updated_at = :updated_at",
-            ExpressionAttributeValues={
-                ":etag": {"S": etag},
-                ":last_modified": {"S": last_modified},
-                ":updated_at": now,
-            },
+            UpdateExpression="SET " + ", ".join(f"{name[1:]} = {name}" for name in values),
+            ExpressionAttributeValues=values,
         )
-        # print(
-        #     f"URL {url} metadata stored: etag: {etag}, last_modified: {last_modified}"
-        # )
+        # print(f"URL {url} metadata stored: {fields}")
     except ClientError as e:
         error_code = e.response["Error"]["Code"]
         error_message = e.response["Error"]["Message"]
@@ -57,104 +114,184 @@ def store_feed_metadata(url, etag, last_modified):
         raise e
 
 
-def id_already_processed(url, id) -> bool:
+def batch_get_items(table, keys, attributes):
+    """
+    Fetch the items with the given keys (a list of dicts) from the table, using
+    BatchGetItem in chunks of 100 keys and retrying any UnprocessedKeys with
+    exponential backoff. Returns only the given attributes of the items found.
+    """
+    # BatchGetItem rejects requests containing duplicate keys
+    unique_keys = list({tuple(sorted(key.items())): key for key in keys}.values())
+    items = []
+    for i in range(0, len(unique_keys), BATCH_GET_MAX_KEYS):
+        request_items = {
+            table.name: {
+                "Keys": unique_keys[i:i + BATCH_GET_MAX_KEYS],
+                "ProjectionExpression": ", ".join(f"#{a}" for a in attributes),
+                "ExpressionAttributeNames": {f"#{a}": a for a in attributes},
+            }
+        }
+        retries = 0
+        while request_items:
+            response = get_dynamodb().batch_get_item(RequestItems=request_items)
+            items.extend(response["Responses"].get(table.name, []))
+            request_items = response.get("UnprocessedKeys")
+            if request_items:
+                if retries >= BATCH_MAX_RETRIES:
+                    raise Exception(
+                        f"BatchGetItem still has unprocessed keys after {retries} retries"
+                    )
+                time.sleep(min(0.05 * 2**retries, 5))
+                retries += 1
+    return items
+
+
+def get_processed_ids(keys) -> set:
+    """
+    Given a list of (url, id) pairs, return the set of those pairs that have
+    already been processed.
+    """
     try:
-        response = processed_ids_table.get_item(Key={"url": url, "id": id})
-        if "Item" not in response:
-            # print(f"No, we have not yet seen {url}+{id}")
-            return False
-        # print(f"Yes, we have already seen {url}+{id}")
-        return True
+        items = batch_get_items(
+            get_table(PROCESSED_IDS_TABLE),
+            [{"url": url, "id": id} for (url, id) in keys],
+            ["url", "id"],
+        )
+        return {(item["url"], item["id"]) for item in items}
+    except ClientError as e:
+        error_code = e.response["Error"]["Code"]
+        error_message = e.response["Error"]["Message"]
+        print(
+            f"DynamoDB error checking which of {len(keys)} ids have already been processed: {error_code} - {error_message}"
+        )
+        raise e
+
+
+def get_seen_canonical_urls(url, keys) -> set:
+    """
+    Given a list of (article_id, canonical_url) pairs from feed `url`, return
+    the set of those canonical urls that some other entry, of this or any
+    other feed, has already claimed within the last CANONICAL_URL_DEDUP_SECS.
+    """
+    claimed_by = {canonical_url: article_id for (article_id, canonical_url) in keys}
+    try:
+        items = batch_get_items(
+            get_table(CANONICAL_URLS_TABLE),
+            [{"canonical_url": canonical_url} for canonical_url in claimed_by],
+            ["canonical_url", "feed_url", "article_id", "expires_at"],
+        )
+        # TTL deletion can lag behind expires_at, so check it ourselves too
+        now = int(time.time())
+        return {
+            item["canonical_url"]
+            for item in items
+            if item["expires_at"] > now
+            and (item.get("feed_url"), item.get("article_id")) != (url, claimed_by[item["canonical_url"]])
+        }
     except ClientError as e:
         error_code = e.response["Error"]["Code"]
         error_message = e.response["Error"]["Message"]
         print(
-            f"DynamoDB error checking if {url}+{id} has already been processed: {error_code} - {error_message}"
+            f"DynamoDB error checking which of {len(keys)} canonical urls have been seen: {error_code} - {error_message}"
         )
         raise e
 
 
-def mark_id_as_processed(url, id):
+def claim_canonical_url(url, article_id, canonical_url) -> bool:
+    """
+    Atomically record that feed `url`'s entry article_id is sending this
+    canonical url. Returns False if some other entry, of this or any other
+    feed (possibly running at the same time), already claimed it within the
+    last CANONICAL_URL_DEDUP_SECS, in which case don't send it. The same entry
+    can take its own claim again: a run that died before sending it leaves the
+    claim behind.
+    """
     now = int(time.time())
     try:
-        processed_ids_table.put_item(Item={
-            "url": url,
-            "id": id,
-            "updated_at": now,
-        })
-        # print(f"Successfully recorded we have seen {url}+{id}")
+        get_table(CANONICAL_URLS_TABLE).put_item(
+            Item={
+                "canonical_url": canonical_url,
+                "feed_url": url,
+                "article_id": article_id,
+                "updated_at": now,
+                "expires_at": now + CANONICAL_URL_DEDUP_SECS,
+            },
+            # TTL deletion can lag behind expires_at, so an expired claim can be taken over
+            ConditionExpression=(
+                "attribute_not_exists(canonical_url) OR expires_at < :now"
+                " OR (feed_url = :url AND article_id = :article_id)"
+            ),
+            ExpressionAttributeValues={":now": now, ":url": url, ":article_id": article_id},
+        )
+        return True
     except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return False
         error_code = e.response["Error"]["Code"]
         error_message = e.response["Error"]["Message"]
         print(
-            f"DynamoDB error marking {url}+{id} as processed: {error_code} - {error_message}"
+            f"DynamoDB error claiming canonical url {canonical_url}: {error_code} - {error_message}"
         )
         raise e
 
 
-def cleanup_processed_ids():
+def release_canonical_urls(url, keys):
+    """
+    Give up feed `url`'s claims on the given (article_id, canonical_url) pairs
+    (they weren't sent), so they can be sent on a later run. Claims by other
+    entries are left alone.
+    """
+    for (article_id, canonical_url) in keys:
+        try:
+            get_table(CANONICAL_URLS_TABLE).delete_item(
+                Key={"canonical_url": canonical_url},
+                ConditionExpression="feed_url = :url AND article_id = :article_id",
+                ExpressionAttributeValues={":url": url, ":article_id": article_id},
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                continue
+            error_code = e.response["Error"]["Code"]
+            error_message = e.response["Error"]["Message"]
+            print(
+                f"DynamoDB error releasing canonical url {canonical_url}: {error_code} - {error_message}"
+            )
+            raise e
+
+
+def mark_ids_as_processed(keys):
+    """
+    Record the given list of (url, id) pairs as processed, using BatchWriteItem
+    via batch_writer (which also resends any unprocessed items).
+    """
     now = int(time.time())
-    cutoff_time = now - CLEANUP_AFTER_SECS
-    total_deleted = 0
-    items_processed = 0
-    batch_size = 25  # Maximum items per batch
-    
     try:
-        # Scan parameters for pagination
-        scan_params = {
-            'FilterExpression': Attr('updated_at').exists() & Attr('updated_at').lt(cutoff_time)
-        }
-        
-        done = False
-        start_key = None
-        
-        while not done:
-            if start_key:
-                scan_params['ExclusiveStartKey'] = start_key
-                
-            response = processed_ids_table.scan(**scan_params)
-            items = response.get('Items', [])
-            items_processed += len(items)
-            
-            # Process in smaller batches
-            for i in range(0, len(items), batch_size):
-                batch_items = items[i:i+batch_size]
-                
-                # Batch delete for efficiency
-                with processed_ids_table.batch_writer() as batch:
-                    for item in batch_items:
-                        batch.delete_item(Key={"url": item["url"], "id": item["id"]})
-                        total_deleted += 1
-                
-                # Add a small delay between batches to avoid throttling
-                if i + batch_size < len(items):
-                    time.sleep(0.5)  # 500ms delay between batches
-            
-            # Add a larger delay between scan pages
-            if response.get('LastEvaluatedKey'):
-                time.sleep(1)  # 1 second delay between scan pages
-            
-            # Check if we need to continue scanning
-            start_key = response.get('LastEvaluatedKey')
-            done = start_key is None
-        
-        print(f"cleanup_processed_ids: Processed {items_processed} records. Deleted {total_deleted} old records (older than {CLEANUP_AFTER_SECS/86400:.1f} days).")
-        
+        with get_table(PROCESSED_IDS_TABLE).batch_writer(overwrite_by_pkeys=["url", "id"]) as batch:
+            for (url, id) in keys:
+                batch.put_item(Item={
+                    "url": url,
+                    "id": id,
+                    "updated_at": now,
+                    "expires_at": now + CLEANUP_AFTER_SECS,
+                })
     except ClientError as e:
         error_code = e.response["Error"]["Code"]
         error_message = e.response["Error"]["Message"]
-        print(f"DynamoDB error cleaning up processed ids: {error_code} - {error_message}")
+        print(
+            f"DynamoDB error marking {len(keys)} ids as processed: {error_code} - {error_message}"
+        )
         raise e
 
+
 def add_updated_at_field_where_missing():
     now = int(time.time())
     try:
-        response = processed_ids_table.scan(
+        response = get_table(PROCESSED_IDS_TABLE).scan(
             FilterExpression=Attr('updated_at').not_exists()
         )
         print(f"add_updated_at_field_where_missing: reviewing {len(response["Items"])} records")
         for item in response["Items"]:
-            processed_ids_table.update_item(
+            get_table(PROCESSED_IDS_TABLE).update_item(
                 Key={"url": item["url"], "id": item["id"]},
                 UpdateExpression="SET updated_at = :updated_at",
                 ExpressionAttributeValues={
@@ -173,12 +310,12 @@ def add_updated_at_field_where_missing():
 
 def clear_updated_at_fields():
     try:
-        response = processed_ids_table.scan(
+        response = get_table(PROCESSED_IDS_TABLE).scan(
             FilterExpression=Attr('updated_at').exists()
         )
         print(f"clear_updated_at_fields: reviewing {len(response["Items"])} records")
         for item in response["Items"]:
-            processed_ids_table.update_item(
+            get_table(PROCESSED_IDS_TABLE).update_item(
                 Key={"url": item["url"], "id": item["id"]},
                 UpdateExpression="REMOVE updated_at",
             )
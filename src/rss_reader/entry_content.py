@@ -0,0 +1,90 @@
+import re
+from html.parser import HTMLParser
+from app_settings import FULL_CONTENT_MIN_CHARS, FULL_CONTENT_MIN_PARAGRAPHS, FULL_CONTENT_TRUNCATION_TEXTS
+
+# Tags whose text we never want, and tags that end a paragraph
+SKIP_TAGS = {"script", "style", "noscript", "iframe", "svg", "figcaption"}
+BLOCK_TAGS = {
+    "p", "div", "br", "li", "blockquote", "pre", "section", "article",
+    "h1", "h2", "h3", "h4", "h5", "h6", "tr", "table", "ul", "ol",
+}
+TRUNCATION_RE = re.compile(
+    "|".join(re.escape(" ".join(text.split())) for text in FULL_CONTENT_TRUNCATION_TEXTS),
+    re.IGNORECASE,
+)
+
+
+class TextExtractor(HTMLParser):
+    """Collect the text of an HTML fragment, one paragraph per line"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.paragraphs = []
+        self.current = []
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self.end_paragraph()
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self.skip_depth = max(self.skip_depth - 1, 0)
+        elif tag in BLOCK_TAGS:
+            self.end_paragraph()
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.current.append(data)
+
+    def end_paragraph(self):
+        paragraph = " ".join("".join(self.current).split())
+        if paragraph:
+            self.paragraphs.append(paragraph)
+        self.current = []
+
+
+def html_to_text(html):
+    parser = TextExtractor()
+    parser.feed(html)
+    parser.close()
+    parser.end_paragraph()
+    return "\n".join(parser.paragraphs)
+
+
+def get_full_content_text(entry):
+    """
+    If the entry carries the full article (e.g. Substack's content:encoded),
+    return its text, one paragraph per line like the scraper produces.
+    Otherwise, e.g. for a teaser or a bare description, return None.
+
+    The heuristic: the content must be at least FULL_CONTENT_MIN_CHARS long,
+    have at least FULL_CONTENT_MIN_PARAGRAPHS paragraphs, and be longer than
+    the entry's summary (unless the summary is just a copy of the content, as
+    feedparser makes when there's no description), and not be a paywalled
+    preview (see FULL_CONTENT_TRUNCATION_TEXTS).
+    """
+    contents = [
+        content.get("value", "")
+        for content in entry.get("content", [])
+        if content.get("type", "text/html") in ("text/html", "application/xhtml+xml", "text/plain")
+    ]
+    if not contents:
+        return None
+
+    content = max(contents, key=len)
+    text = html_to_text(content)
+    if len(text) < FULL_CONTENT_MIN_CHARS:
+        return None
+    if text.count("\n") + 1 < FULL_CONTENT_MIN_PARAGRAPHS:
+        return None
+    summary = entry.get("summary", "")
+    if summary != content and len(text) <= len(html_to_text(summary)):
+        return None
+    match = TRUNCATION_RE.search(text)
+    if match:
+        print(f"Entry content is a paywalled preview (\"{match.group(0)}\"), leaving it to the scraper")
+        return None
+    return text
@@ -0,0 +1,66 @@
+import gzip
+import time
+import zlib
+import urllib.error
+import urllib.request
+import feedparser
+from feedparser.http import ACCEPT_HEADER
+from app_settings import FEED_FETCH_TIMEOUT_SECS
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def fetch_feed(feed_url, etag=None, last_modified=None):
+    """
+    Fetch the raw bytes of a feed, sending If-None-Match/If-Modified-Since when
+    we have them. The whole fetch, not just each socket read, should finish
+    within FEED_FETCH_TIMEOUT_SECS, but the deadline is only approximate: it's
+    checked between reads, and connecting and each read have their own
+    FEED_FETCH_TIMEOUT_SECS timeout, so a slow feed can take up to about twice
+    that. DNS lookups aren't covered at all.
+
+    Returns (status, headers, body). headers has lowercased keys, as
+    feedparser expects in response_headers. body is None unless status is 2xx.
+    """
+    deadline = time.monotonic() + FEED_FETCH_TIMEOUT_SECS
+    request_headers = {
+        "User-Agent": feedparser.USER_AGENT,
+        "Accept": ACCEPT_HEADER,
+        "Accept-Encoding": "gzip, deflate",
+    }
+    if etag:
+        request_headers["If-None-Match"] = etag
+    if last_modified:
+        request_headers["If-Modified-Since"] = last_modified
+
+    request = urllib.request.Request(feed_url, headers=request_headers)
+    try:
+        response = urllib.request.urlopen(request, timeout=FEED_FETCH_TIMEOUT_SECS)
+    except urllib.error.HTTPError as e:
+        # includes 304 Not Modified
+        with e:
+            return (e.code, {k.lower(): v for (k, v) in e.headers.items()}, None)
+
+    with response:
+        headers = {k.lower(): v for (k, v) in response.headers.items()}
+        # lets feedparser resolve relative links against where we ended up after redirects
+        headers.setdefault("content-location", response.url)
+
+        chunks = []
+        while chunk := response.read(READ_CHUNK_SIZE):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Fetching {feed_url} took longer than {FEED_FETCH_TIMEOUT_SECS} seconds")
+            chunks.append(chunk)
+        body = b"".join(chunks)
+
+    content_encoding = headers.get("content-encoding", "").lower()
+    if content_encoding == "gzip":
+        body = gzip.decompress(body)
+    elif content_encoding == "deflate":
+        try:
+            body = zlib.decompress(body)
+        except zlib.error:
+            # some servers send raw deflate without the zlib header
+            body = zlib.decompress(body, -zlib.MAX_WBITS)
+
+    return (response.status, headers, body)
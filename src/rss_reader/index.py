@@ -1,13 +1,18 @@
 import json
 import traceback
-from app_settings import show_settings
-from app import read_rss_feeds
+from app_settings import show_settings, FORCE_FULL_POLL
+from app import read_rss_feeds, read_rss_feed_shard
 
 
-def handler(event, context):  # pylint: disable=unused-argument
+def handler(event, context):
     try:
         show_settings()
-        read_rss_feeds()
+        force_poll = FORCE_FULL_POLL or event.get("force_poll", False)
+        if "feeds" in event:
+            # invoked by the dispatcher with a shard of the feeds
+            read_rss_feed_shard(event["feeds"], force_poll)
+        else:
+            read_rss_feeds(force_poll, getattr(context, "function_name", None))
 
     except Exception as e:
         stack_trace = traceback.format_exc()
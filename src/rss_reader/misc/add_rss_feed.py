@@ -1,41 +1,45 @@
 #!/usr/bin/env python
 
-# Add the provided rss feed to the DAILY_MAIL_RSS_FEEDS parameter in AWS parameter store
+# Add the provided rss feed(s) to the DailyMail-RssReaderFeeds table (the feed registry)
 
 import sys
-import boto3
 import json
+import boto3
+from botocore.exceptions import ClientError
 
 if len(sys.argv) < 2:
     print(f"Usage: {sys.argv[0]} <feed> [<feed> ...]")
     sys.exit(1)
 
-ssm = boto3.client("ssm")
+dynamodb = boto3.resource("dynamodb")
+feeds_table = dynamodb.Table("DailyMail-RssReaderFeeds")
 
-# fetch existing rss feeds from parameter store
-# catch and ignore ParameterNotFound
-try:
-    response = ssm.get_parameter(Name="DAILY_MAIL_RSS_FEEDS")
-    existing_feeds = json.loads(response["Parameter"]["Value"])
-    existing_feeds = sorted(existing_feeds)
-except ssm.exceptions.ParameterNotFound:
-    existing_feeds = []
+# fetch existing rss feeds from the registry
+existing_feeds = []
+scan_params = {}
+while True:
+    response = feeds_table.scan(**scan_params)
+    existing_feeds.extend(item["url"] for item in response.get("Items", []))
+    if "LastEvaluatedKey" not in response:
+        break
+    scan_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+existing_feeds = sorted(existing_feeds)
 
 print(f"Existing feeds ({len(existing_feeds)}):")
 print(json.dumps(existing_feeds, indent=2))
 
-# now append the provided rss feeds, removing any duplicates
-rss_feeds = existing_feeds + sys.argv[1:]
-rss_feeds = list(set(rss_feeds))
-rss_feeds = sorted(rss_feeds)
-
+# now add the provided rss feeds. An existing feed is left alone: putting it
+# again would replace the whole item, losing its settings (context,
+# stop_after_seen, ...)
+for feed in sys.argv[1:]:
+    try:
+        feeds_table.put_item(Item={"url": feed}, ConditionExpression="attribute_not_exists(#url)",
+                             ExpressionAttributeNames={"#url": "url"})
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise e
+        print(f"{feed} is already in the registry, leaving it as is")
+
+rss_feeds = sorted(set(existing_feeds + sys.argv[1:]))
 print(f"New feeds ({len(rss_feeds)}):")
 print(json.dumps(rss_feeds, indent=2))
-
-# store them as JSON in parameter store
-ssm.put_parameter(
-    Name="DAILY_MAIL_RSS_FEEDS",
-    Value=json.dumps(rss_feeds),
-    Type="String",
-    Overwrite=True,
-)
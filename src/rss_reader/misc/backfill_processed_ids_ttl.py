@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+
+# One-time backfill of the expires_at (TTL) attribute on DailyMail-RssReaderProcessedIds
+# rows written before the rss_reader started setting it. Rows expire
+# CLEANUP_AFTER_SECS after their updated_at (or after now, if they have none).
+# Safe to re-run: rows that already have expires_at are skipped.
+
+import time
+import boto3
+from boto3.dynamodb.conditions import Attr
+
+CLEANUP_AFTER_SECS = 5 * 365 * 24 * 60 * 60  # 5 years, keep in sync with db.py
+
+dynamodb = boto3.resource("dynamodb")
+processed_ids_table = dynamodb.Table("DailyMail-RssReaderProcessedIds")
+
+now = int(time.time())
+scan_params = {
+    "FilterExpression": Attr("expires_at").not_exists(),
+}
+total_updated = 0
+while True:
+    response = processed_ids_table.scan(**scan_params)
+    for item in response.get("Items", []):
+        updated_at = int(item.get("updated_at", now))
+        processed_ids_table.update_item(
+            Key={"url": item["url"], "id": item["id"]},
+            UpdateExpression="SET expires_at = :expires_at",
+            ExpressionAttributeValues={":expires_at": updated_at + CLEANUP_AFTER_SECS},
+        )
+        total_updated += 1
+    print(f"Updated {total_updated} records so far")
+    if "LastEvaluatedKey" not in response:
+        break
+    scan_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+print(f"Done, set expires_at on {total_updated} records")
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+
+# One-time copy of the feeds in the DAILY_MAIL_RSS_FEEDS parameter into the
+# DailyMail-RssReaderFeeds table (the feed registry). Once the table has any
+# feeds, the rss_reader reads from it instead of the parameter.
+
+import json
+import boto3
+from botocore.exceptions import ClientError
+
+ssm = boto3.client("ssm")
+dynamodb = boto3.resource("dynamodb")
+feeds_table = dynamodb.Table("DailyMail-RssReaderFeeds")
+
+response = ssm.get_parameter(Name="DAILY_MAIL_RSS_FEEDS")
+feeds = json.loads(response["Parameter"]["Value"])
+
+for feed_config in feeds:
+    # A feed is either just its url, or a dict with the url and settings
+    if isinstance(feed_config, str):
+        feed_config = {"url": feed_config}
+    # Don't overwrite a feed that's already in the table (say this is run
+    # twice), it may have been edited since
+    try:
+        feeds_table.put_item(Item=feed_config, ConditionExpression="attribute_not_exists(#url)",
+                             ExpressionAttributeNames={"#url": "url"})
+        print(f"Copied {feed_config['url']}")
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise e
+        print(f"{feed_config['url']} is already in the table, leaving it as is")
+
+print(f"Copied {len(feeds)} feeds to {feeds_table.name}")
@@ -0,0 +1,37 @@
+from app_settings import (
+    POLL_MIN_INTERVAL_SECS,
+    POLL_MAX_INTERVAL_SECS,
+    POLL_DUE_SLACK_SECS,
+)
+
+
+def is_feed_due(metadata, now) -> bool:
+    """
+    A feed is due if it has never been scheduled, or if its next poll time has
+    arrived (give or take POLL_DUE_SLACK_SECS, since the cron doesn't fire at
+    exactly the same second every day).
+    """
+    next_poll_at = metadata.get("next_poll_at")
+    return next_poll_at is None or now + POLL_DUE_SLACK_SECS >= next_poll_at
+
+
+def schedule_next_poll(metadata, now, found_new_entries) -> dict:
+    """
+    Return the poll history fields to store after polling a feed at `now`.
+    A feed with new entries goes back to the minimum interval, and each quiet
+    poll doubles the interval, up to the maximum.
+    """
+    previous_interval = metadata.get("poll_interval")
+    if found_new_entries or previous_interval is None:
+        interval = POLL_MIN_INTERVAL_SECS
+    else:
+        interval = min(max(previous_interval * 2, POLL_MIN_INTERVAL_SECS), POLL_MAX_INTERVAL_SECS)
+
+    fields = {
+        "last_polled_at": now,
+        "poll_interval": interval,
+        "next_poll_at": now + interval,
+    }
+    if found_new_entries:
+        fields["last_changed_at"] = now
+    return fields
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The rss_reader's modules import each other as top-level modules, as they do in
+# the Lambda image, and create boto3 clients at import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-west-2")
@@ -0,0 +1,90 @@
+import http.client
+import zlib
+import feedparser
+import pytest
+import app
+
+FEED_URL = "https://example.com/feed.xml"
+# The second item has no pubDate, so reading its entry.published raises
+FEED = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel><title>Example</title>
+<item><title>One</title><link>https://example.com/one</link><guid>1</guid>
+<description>First</description><pubDate>Mon, 06 Oct 2025 10:00:00 GMT</pubDate></item>
+<item><title>Two</title><link>https://example.com/two</link><guid>2</guid>
+<description>Second</description></item>
+</channel></rss>"""
+
+
+class FakeDb:
+    """Just enough of db's canonical url claims and processed ids"""
+    def __init__(self):
+        self.claims = {}
+        self.processed = set()
+
+    def get_seen_canonical_urls(self, url, keys):
+        return {
+            canonical_url for (article_id, canonical_url) in keys
+            if canonical_url in self.claims and self.claims[canonical_url] != (url, article_id)
+        }
+
+    def claim_canonical_url(self, url, article_id, canonical_url):
+        if self.claims.get(canonical_url, (url, article_id)) != (url, article_id):
+            return False
+        self.claims[canonical_url] = (url, article_id)
+        return True
+
+    def release_canonical_urls(self, url, keys):
+        for (article_id, canonical_url) in keys:
+            if self.claims.get(canonical_url) == (url, article_id):
+                del self.claims[canonical_url]
+
+
+@pytest.fixture(name="db")
+def fixture_db(monkeypatch):
+    db = FakeDb()
+    sent = []
+    monkeypatch.setattr(app, "get_processed_ids", lambda keys: {key for key in keys if key in db.processed})
+    monkeypatch.setattr(app, "mark_ids_as_processed", db.processed.update)
+    monkeypatch.setattr(app, "get_seen_canonical_urls", db.get_seen_canonical_urls)
+    monkeypatch.setattr(app, "claim_canonical_url", db.claim_canonical_url)
+    monkeypatch.setattr(app, "release_canonical_urls", db.release_canonical_urls)
+    monkeypatch.setattr(app, "enqueue_batch", lambda queue, objs: (sent.extend(objs), set(range(len(objs))))[1])
+    db.sent = sent
+    return db
+
+
+def process(entries):
+    return app.process_rss_entries(FEED_URL, "Example", "", None, entries)
+
+
+def test_claims_are_released_when_an_entry_fails_before_sending(db):
+    with pytest.raises(AttributeError):
+        process(feedparser.parse(FEED).entries)
+    assert not db.claims
+    assert not db.processed
+
+
+def test_an_entry_can_take_back_its_own_leftover_claim(db):
+    # as if an earlier run timed out between claiming and sending
+    db.claims["https://example.com/one"] = (FEED_URL, "1")
+    entries = feedparser.parse(FEED).entries[:1]
+    (new_entries, _) = process(entries)
+    assert new_entries == 1
+    assert len(db.sent) == 1
+
+
+def test_another_feeds_claim_is_respected(db):
+    db.claims["https://example.com/one"] = ("https://other.example.com/feed.xml", "a")
+    (new_entries, _) = process(feedparser.parse(FEED).entries[:1])
+    assert new_entries == 0
+    assert not db.sent
+    assert (FEED_URL, "1") in db.processed
+
+
+@pytest.mark.parametrize("error", [zlib.error("invalid stored block lengths"), http.client.IncompleteRead(b"<rss")])
+def test_feed_with_a_broken_body_is_skipped(monkeypatch, error):
+    def fetch_feed(url, etag, last_modified):
+        raise error
+    monkeypatch.setattr(app, "get_feed_metadata", lambda url: {})
+    monkeypatch.setattr(app, "fetch_feed", fetch_feed)
+    assert app.read_feed(FEED_URL, force_poll=True) is None
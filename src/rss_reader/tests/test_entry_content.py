@@ -0,0 +1,38 @@
+import feedparser
+from entry_content import get_full_content_text
+
+PARAGRAPH = "The council voted on Tuesday to approve the new budget for the coming year, after a long debate. " * 4
+
+
+def make_feed(description, content):
+    description = f"<description><![CDATA[{description}]]></description>" if description else ""
+    return f"""<?xml version="1.0"?>
+<rss version="2.0" xmlns:content="http://purl.org/rss/1.0/modules/content/"><channel><title>Example</title>
+<item><title>One</title><link>https://example.com/one</link>{description}
+<content:encoded><![CDATA[{content}]]></content:encoded></item>
+</channel></rss>""".encode("utf-8")
+
+
+def test_content_only_item_is_full_content():
+    content = "".join(f"<p>{PARAGRAPH}</p>" for _ in range(5))
+    entry = feedparser.parse(make_feed(None, content)).entries[0]
+    # feedparser copies the content into the summary when there's no description
+    assert entry.summary == content
+    assert get_full_content_text(entry) == "\n".join([PARAGRAPH.strip()] * 5)
+
+
+def test_content_no_longer_than_the_description_is_not_full_content():
+    content = "".join(f"<p>{PARAGRAPH}</p>" for _ in range(5))
+    entry = feedparser.parse(make_feed(content + "<p>More</p>", content)).entries[0]
+    assert get_full_content_text(entry) is None
+
+
+def test_teaser_is_not_full_content():
+    entry = feedparser.parse(make_feed("A teaser", f"<p>{PARAGRAPH}</p>")).entries[0]
+    assert get_full_content_text(entry) is None
+
+
+def test_paywalled_preview_is_not_full_content():
+    content = "".join(f"<p>{PARAGRAPH}</p>" for _ in range(5)) + "<p>Keep reading with a 7-day free trial</p>"
+    entry = feedparser.parse(make_feed(None, content)).entries[0]
+    assert get_full_content_text(entry) is None
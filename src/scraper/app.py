@@ -1,8 +1,17 @@
-import uuid
 import json
 from scrape import fetch_site_content
-from app_settings import SUMMARIZER_BUCKET
-from dailymail_shared.my_s3 import write_to_s3
+from scrape_cache import get_cached_scrape, put_cached_scrape, get_canonical_url
+from fingerprint import simhash
+from db import (
+    get_domain_paywall_status,
+    claim_paywall_reprobe,
+    release_paywall_reprobe,
+    record_paywall_outcome,
+    find_near_duplicate,
+    add_fingerprint,
+)
+from app_settings import SUMMARIZER_BUCKET, SUMMARIZER_QUEUE, SUMMARIZER_INLINE_MAX_BYTES, NEAR_DUPLICATE_MIN_CHARS
+from dailymail_shared.my_summarizer_bucket import send_to_summarizer
 
 
 def process_record(sqs_record):
@@ -22,10 +31,41 @@ def process_record(sqs_record):
 
 def scrape_url(record):
     """
-    Given a record with a url, scrape the content and write it to the summarizer bucket
+    Given a record with a url, scrape the content and send it to the summarizer
     """
-    # Now that we have the url, we can scrape it
-    (fetched_title, fetched_content, is_paywalled) = fetch_site_content(record["url"])
+    domain_status = get_domain_paywall_status(record["url"])
+
+    # Now that we have the url, we can scrape it, unless it was scraped
+    # recently (a redriven message, or the same article arriving twice)
+    cached = get_cached_scrape(record)
+    if cached:
+        (fetched_title, fetched_content, is_paywalled) = cached
+    else:
+        # STOP before fetching anything if the site paywalls everything
+        # anyway, unless it's time to re-probe it. The re-probe is claimed
+        # only now that we're about to fetch, and given back if the fetch
+        # doesn't get anywhere.
+        reprobe_claimed_at = None
+        if domain_status == "paywalled":
+            reprobe_claimed_at = claim_paywall_reprobe(record["url"])
+            if reprobe_claimed_at is None:
+                print("Domain is almost always paywalled, skipping")
+                return
+            print("Domain is almost always paywalled, re-probing it")
+        try:
+            (fetched_title, fetched_content, is_paywalled) = fetch_site_content(record["url"])
+        except Exception as e:
+            # including DeferFetch: the record will be back
+            if reprobe_claimed_at is not None:
+                release_paywall_reprobe(record["url"], reprobe_claimed_at)
+            raise e
+        # Don't cache or count pages we got nothing from, it may have been a
+        # bad moment
+        if fetched_content or is_paywalled:
+            put_cached_scrape(record, fetched_title, fetched_content, is_paywalled)
+            record_paywall_outcome(record["url"], is_paywalled, reprobe=reprobe_claimed_at is not None)
+        elif reprobe_claimed_at is not None:
+            release_paywall_reprobe(record["url"], reprobe_claimed_at)
     print(f"Title: {fetched_title}")
     content_brief = fetched_content.replace("\n", " ")[:100]
     print(f"Content (first 100 chars): {content_brief}")
@@ -41,18 +81,24 @@ def scrape_url(record):
         print("Content appears to be paywalled, skipping")
         return
 
-    # Now update the record and write it to the summarizer bucket
+    # STOP if it's (nearly) the same as an article we've recently scraped,
+    # e.g. a syndicated wire story
+    if len(fetched_content) >= NEAR_DUPLICATE_MIN_CHARS:
+        fingerprint = simhash(fetched_content)
+        canonical_url = get_canonical_url(record)
+        duplicate_of = find_near_duplicate(fingerprint, canonical_url)
+        if duplicate_of:
+            print(f"Content is a near-duplicate of {duplicate_of}, skipping")
+            return
+        add_fingerprint(fingerprint, record["url"], canonical_url)
+
+    # Now update the record and send it to the summarizer
     record["title"] = fetched_title
     record["content"] = fetched_content
 
-    write_to_summarizer_bucket(record)
+    destination = send_to_summarizer(SUMMARIZER_BUCKET, SUMMARIZER_QUEUE, record, SUMMARIZER_INLINE_MAX_BYTES)
 
-    print(f"Successfully scraped url contents and wrote them to {SUMMARIZER_BUCKET}")
-
-
-def write_to_summarizer_bucket(record):
-    key = f"incoming/{uuid.uuid4()}"
-    write_to_s3(SUMMARIZER_BUCKET, key, json.dumps(record))
+    print(f"Successfully scraped url contents and sent them to {destination}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,37 @@
+import math
+import boto3
+from dailymail_shared.my_sqs import get_queue_url
+
+sqs = boto3.client('sqs')
+
+# SQS's limit on a message's delay
+MAX_DELAY_SECS = 15 * 60
+DEFER_COUNT_ATTRIBUTE = "DeferCount"
+
+
+def get_defer_count(sqs_record):
+    """How many times the record has been deferred already"""
+    attribute = sqs_record.get("messageAttributes", {}).get(DEFER_COUNT_ATTRIBUTE)
+    return int(attribute["stringValue"]) if attribute else 0
+
+
+def defer_message(sqs_record, delay_secs):
+    """
+    Send a copy of the record's message back onto its queue, delayed by
+    delay_secs (up to SQS's limit of 15 minutes). The original can then be
+    reported as done: reporting it as a batch item failure instead would use
+    up one of its receives, and a record for a busy site would end up in the
+    DLQ. The copy carries how many times it's been deferred.
+    """
+    queue_name = sqs_record["eventSourceARN"].split(":")[-1]
+    sqs.send_message(
+        QueueUrl=get_queue_url(queue_name),
+        MessageBody=sqs_record["body"],
+        DelaySeconds=max(0, min(math.ceil(delay_secs), MAX_DELAY_SECS)),
+        MessageAttributes={
+            DEFER_COUNT_ATTRIBUTE: {
+                "DataType": "Number",
+                "StringValue": str(get_defer_count(sqs_record) + 1),
+            },
+        },
+    )
@@ -2,6 +2,83 @@ import os
 
 PIPELINE_EXECUTION_ID = os.environ.get("PIPELINE_EXECUTION_ID", "Unknown")
 SUMMARIZER_BUCKET = os.environ.get("SUMMARIZER_BUCKET", "skehlet-dailymail-summarizer")
+# Scraped records up to this size go straight onto the summarizer queue,
+# larger ones by way of the summarizer bucket
+SUMMARIZER_QUEUE = "DailyMail-SummarizerQueue"
+SUMMARIZER_INLINE_MAX_BYTES = int(os.environ.get("SUMMARIZER_INLINE_MAX_BYTES", str(200 * 1024)))
+# Records in a batch are processed concurrently: downloads in up to
+# SCRAPER_WORKERS threads, but at most SCRAPER_PARSE_WORKERS of them parsing at
+# once, since parsing is CPU and memory heavy
+SCRAPER_WORKERS = int(os.environ.get("SCRAPER_WORKERS", "4"))
+SCRAPER_PARSE_WORKERS = int(os.environ.get("SCRAPER_PARSE_WORKERS", "1"))
+# Which extractor to try first ("fast" or "unstructured"), and how confident
+# the fast extractor must be before we skip falling back to unstructured
+SCRAPER_EXTRACTOR = os.environ.get("SCRAPER_EXTRACTOR", "fast")
+FAST_EXTRACTOR_MIN_CONFIDENCE = float(os.environ.get("FAST_EXTRACTOR_MIN_CONFIDENCE", "0.5"))
+# Pages are downloaded up to SCRAPER_MAX_DOWNLOAD_BYTES (decompressed), and
+# only SCRAPER_MAX_CONTENT_CHARS of their text is kept: the summarizer
+# truncates to its CONTEXT_WINDOW_SIZE anyway, so there's no point in more
+SCRAPER_MAX_DOWNLOAD_BYTES = int(os.environ.get("SCRAPER_MAX_DOWNLOAD_BYTES", str(5 * 1024 * 1024)))
+SCRAPER_MAX_CONTENT_CHARS = int(os.environ.get("SCRAPER_MAX_CONTENT_CHARS", os.environ.get("CONTEXT_WINDOW_SIZE", "50000")))
+# Anything not served as one of these, or as a PDF, (video, images, binaries)
+# isn't scraped
+SCRAPER_CONTENT_TYPES = [
+    "text/html",
+    "application/xhtml+xml",
+]
+# PDFs over SCRAPER_MAX_PDF_BYTES are skipped (they can't be read cut short),
+# and only the first SCRAPER_MAX_PDF_PAGES pages of the rest are read
+SCRAPER_MAX_PDF_BYTES = int(os.environ.get("SCRAPER_MAX_PDF_BYTES", str(25 * 1024 * 1024)))
+SCRAPER_MAX_PDF_PAGES = int(os.environ.get("SCRAPER_MAX_PDF_PAGES", "50"))
+# The HTTP session keeps connections to up to SCRAPER_POOL_HOSTS hosts, up to
+# SCRAPER_POOL_PER_HOST each, and retries connection errors and 500, 502 and
+# 504 responses
+SCRAPER_POOL_HOSTS = int(os.environ.get("SCRAPER_POOL_HOSTS", "20"))
+SCRAPER_POOL_PER_HOST = int(os.environ.get("SCRAPER_POOL_PER_HOST", str(SCRAPER_WORKERS)))
+SCRAPER_HTTP_RETRIES = int(os.environ.get("SCRAPER_HTTP_RETRIES", "2"))
+# Scrape results are cached in the summarizer bucket, under this prefix, for
+# this many days (see also the bucket's lifecycle rule)
+SCRAPE_CACHE_PREFIX = os.environ.get("SCRAPE_CACHE_PREFIX", "cache/")
+SCRAPE_CACHE_DAYS = int(os.environ.get("SCRAPE_CACHE_DAYS", "7"))
+# Paywall signatures by domain, as JSON, on top of PAYWALL_TEXTS (see paywall.py)
+PAYWALL_SIGNATURES_PARAMETER_NAME = os.environ.get("PAYWALL_SIGNATURES_PARAMETER_NAME", "DAILY_MAIL_PAYWALL_SIGNATURES")
+PAYWALL_SIGNATURES_REFRESH_SECS = int(os.environ.get("PAYWALL_SIGNATURES_REFRESH_SECS", "900"))
+# Once at least PAYWALL_DOMAIN_MIN_SAMPLES scrapes of a domain have found a
+# paywall PAYWALL_DOMAIN_THRESHOLD of the time, its urls aren't fetched at
+# all, except for one every PAYWALL_DOMAIN_REPROBE_HOURS
+PAYWALL_DOMAIN_THRESHOLD = float(os.environ.get("PAYWALL_DOMAIN_THRESHOLD", "0.9"))
+PAYWALL_DOMAIN_MIN_SAMPLES = int(os.environ.get("PAYWALL_DOMAIN_MIN_SAMPLES", "5"))
+PAYWALL_DOMAIN_REPROBE_HOURS = int(os.environ.get("PAYWALL_DOMAIN_REPROBE_HOURS", "24"))
+# Articles whose content's SimHash is within NEAR_DUPLICATE_MAX_DISTANCE bits
+# (of 64) of one scraped in the last NEAR_DUPLICATE_DAYS are dropped as
+# near-duplicates, e.g. the same wire story on several sites. Content shorter
+# than NEAR_DUPLICATE_MIN_CHARS isn't checked: its fingerprints are unreliable.
+# Fingerprints are indexed under keys of NEAR_DUPLICATE_KEY_BLOCKS blocks each
+# (see fingerprint.get_bands): wider keys make each lookup read less of the
+# index, but there are more of them. misc/benchmark_simhash.py, on 2-20 KB
+# texts, measured (recall for 0/1/3 edits; precision was 100% throughout, as
+# unrelated texts land 20+ bits apart):
+#   distance 3, 1 block:  4 keys of 16 bits, recall 46/37/28%, 0.006% of the index per lookup
+#   distance 6, 2 blocks: 28 keys of 16 bits, recall 82/76/62%, 0.04% of the index per lookup
+#   distance 10, 1 block: 11 keys of 5 bits, recall 98/98/87%, 34% of the index per lookup
+NEAR_DUPLICATE_MAX_DISTANCE = int(os.environ.get("NEAR_DUPLICATE_MAX_DISTANCE", "6"))
+NEAR_DUPLICATE_KEY_BLOCKS = int(os.environ.get("NEAR_DUPLICATE_KEY_BLOCKS", "2"))
+NEAR_DUPLICATE_DAYS = int(os.environ.get("NEAR_DUPLICATE_DAYS", "3"))
+NEAR_DUPLICATE_MIN_CHARS = int(os.environ.get("NEAR_DUPLICATE_MIN_CHARS", "500"))
+# Each domain is fetched at most SCRAPER_DOMAIN_RATE times a second, in bursts
+# of up to SCRAPER_DOMAIN_BURST. A record that would have to wait more than
+# SCRAPER_DOMAIN_MAX_WAIT_SECS for its turn, or whose site is throttling us or
+# unreachable, goes back on the queue for later: its Retry-After if it gave
+# one, else a jittered backoff from SCRAPER_DEFER_BASE_SECS doubling each
+# attempt, up to SCRAPER_DEFER_MAX_SECS (SQS delays a message by at most 15
+# minutes). Deferring doesn't use up one of the record's receives; after
+# SCRAPER_MAX_DEFERS of them, it's failed like any other error.
+SCRAPER_DOMAIN_RATE = float(os.environ.get("SCRAPER_DOMAIN_RATE", "0.5"))
+SCRAPER_DOMAIN_BURST = int(os.environ.get("SCRAPER_DOMAIN_BURST", "2"))
+SCRAPER_DOMAIN_MAX_WAIT_SECS = int(os.environ.get("SCRAPER_DOMAIN_MAX_WAIT_SECS", "10"))
+SCRAPER_DEFER_BASE_SECS = int(os.environ.get("SCRAPER_DEFER_BASE_SECS", "60"))
+SCRAPER_DEFER_MAX_SECS = int(os.environ.get("SCRAPER_DEFER_MAX_SECS", "900"))
+SCRAPER_MAX_DEFERS = int(os.environ.get("SCRAPER_MAX_DEFERS", "10"))
 PAYWALL_TEXTS = [
     "This post is for paid subscribers",
     "This post is for paying subscribers only",
@@ -11,3 +88,34 @@ PAYWALL_TEXTS = [
 def show_settings():
     print(f"{PIPELINE_EXECUTION_ID=}")
     print(f"{SUMMARIZER_BUCKET=}")
+    print(f"{SUMMARIZER_QUEUE=}")
+    print(f"{SUMMARIZER_INLINE_MAX_BYTES=}")
+    print(f"{SCRAPER_WORKERS=}")
+    print(f"{SCRAPER_PARSE_WORKERS=}")
+    print(f"{SCRAPER_EXTRACTOR=}")
+    print(f"{FAST_EXTRACTOR_MIN_CONFIDENCE=}")
+    print(f"{SCRAPER_MAX_DOWNLOAD_BYTES=}")
+    print(f"{SCRAPER_MAX_CONTENT_CHARS=}")
+    print(f"{SCRAPER_CONTENT_TYPES=}")
+    print(f"{SCRAPER_MAX_PDF_BYTES=}")
+    print(f"{SCRAPER_MAX_PDF_PAGES=}")
+    print(f"{SCRAPER_POOL_HOSTS=}")
+    print(f"{SCRAPER_POOL_PER_HOST=}")
+    print(f"{SCRAPER_HTTP_RETRIES=}")
+    print(f"{SCRAPE_CACHE_PREFIX=}")
+    print(f"{SCRAPE_CACHE_DAYS=}")
+    print(f"{PAYWALL_SIGNATURES_PARAMETER_NAME=}")
+    print(f"{PAYWALL_SIGNATURES_REFRESH_SECS=}")
+    print(f"{PAYWALL_DOMAIN_THRESHOLD=}")
+    print(f"{PAYWALL_DOMAIN_MIN_SAMPLES=}")
+    print(f"{PAYWALL_DOMAIN_REPROBE_HOURS=}")
+    print(f"{NEAR_DUPLICATE_MAX_DISTANCE=}")
+    print(f"{NEAR_DUPLICATE_KEY_BLOCKS=}")
+    print(f"{NEAR_DUPLICATE_DAYS=}")
+    print(f"{NEAR_DUPLICATE_MIN_CHARS=}")
+    print(f"{SCRAPER_DOMAIN_RATE=}")
+    print(f"{SCRAPER_DOMAIN_BURST=}")
+    print(f"{SCRAPER_DOMAIN_MAX_WAIT_SECS=}")
+    print(f"{SCRAPER_DEFER_BASE_SECS=}")
+    print(f"{SCRAPER_DEFER_MAX_SECS=}")
+    print(f"{SCRAPER_MAX_DEFERS=}")
@@ -0,0 +1,188 @@
+import time
+from botocore.exceptions import ClientError
+from boto3.dynamodb.conditions import Key
+from dailymail_shared.my_dynamodb import get_table
+from dailymail_shared.my_urls import get_domain
+from fingerprint import get_bands, hamming_distance
+from app_settings import (
+    PAYWALL_DOMAIN_THRESHOLD,
+    PAYWALL_DOMAIN_MIN_SAMPLES,
+    PAYWALL_DOMAIN_REPROBE_HOURS,
+    NEAR_DUPLICATE_MAX_DISTANCE,
+    NEAR_DUPLICATE_KEY_BLOCKS,
+    NEAR_DUPLICATE_DAYS,
+)
+
+# Records are scraped from a thread pool, so tables are looked up per thread
+# (see get_table) rather than shared
+PAYWALLED_DOMAINS_TABLE = "DailyMail-ScraperPaywalledDomains"
+FINGERPRINTS_TABLE = "DailyMail-ScraperFingerprints"
+
+PAYWALL_DOMAIN_REPROBE_SECS = PAYWALL_DOMAIN_REPROBE_HOURS * 60 * 60
+# Fingerprints carry an expires_at attribute, and DynamoDB's TTL deletes them
+NEAR_DUPLICATE_SECS = NEAR_DUPLICATE_DAYS * 24 * 60 * 60
+
+
+def is_paywalled_domain(stats):
+    attempts = int(stats.get("attempts", 0))
+    paywalled = int(stats.get("paywalled", 0))
+    return attempts >= PAYWALL_DOMAIN_MIN_SAMPLES and paywalled / attempts >= PAYWALL_DOMAIN_THRESHOLD
+
+
+def get_domain_paywall_status(url):
+    """
+    Returns "paywalled" if the url's domain paywalls (nearly) everything we
+    scrape from it, so there's no point fetching it, otherwise "scrape". Once
+    every PAYWALL_DOMAIN_REPROBE_HOURS one of a paywalled domain's urls is let
+    through anyway, in case the domain has changed its ways: see
+    claim_paywall_reprobe.
+    """
+    domain = get_domain(url)
+    try:
+        stats = get_table(PAYWALLED_DOMAINS_TABLE).get_item(Key={"domain": domain}).get("Item", {})
+    except ClientError as e:
+        error_code = e.response["Error"]["Code"]
+        error_message = e.response["Error"]["Message"]
+        print(f"DynamoDB error getting paywall stats for {domain}: {error_code} - {error_message}")
+        raise e
+
+    if not is_paywalled_domain(stats):
+        return "scrape"
+    print(f"{domain} was paywalled in {stats['paywalled']} of {stats['attempts']} scrapes")
+    return "paywalled"
+
+
+def claim_paywall_reprobe(url):
+    """
+    Claim the re-probe of the url's paywalled domain, so only one of any
+    concurrent scrapes makes it. Returns the claim's timestamp (for
+    release_paywall_reprobe), or None if the domain was re-probed in the last
+    PAYWALL_DOMAIN_REPROBE_HOURS.
+    """
+    domain = get_domain(url)
+    now = int(time.time())
+    try:
+        get_table(PAYWALLED_DOMAINS_TABLE).update_item(
+            Key={"domain": domain},
+            UpdateExpression="SET last_probed_at = :now",
+            ConditionExpression="attribute_not_exists(last_probed_at) OR last_probed_at < :cutoff",
+            ExpressionAttributeValues={":now": now, ":cutoff": now - PAYWALL_DOMAIN_REPROBE_SECS},
+        )
+        return now
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return None
+        error_code = e.response["Error"]["Code"]
+        error_message = e.response["Error"]["Message"]
+        print(f"DynamoDB error claiming the re-probe of {domain}: {error_code} - {error_message}")
+        raise e
+
+
+def release_paywall_reprobe(url, claimed_at):
+    """
+    Give back a re-probe claim that didn't get to probe anything (the fetch
+    was deferred, or failed), so a later scrape can make it
+    """
+    domain = get_domain(url)
+    try:
+        get_table(PAYWALLED_DOMAINS_TABLE).update_item(
+            Key={"domain": domain},
+            UpdateExpression="REMOVE last_probed_at",
+            ConditionExpression="last_probed_at = :claimed_at",
+            ExpressionAttributeValues={":claimed_at": claimed_at},
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return
+        error_code = e.response["Error"]["Code"]
+        error_message = e.response["Error"]["Message"]
+        print(f"DynamoDB error releasing the re-probe of {domain}: {error_code} - {error_message}")
+        raise e
+
+
+def record_paywall_outcome(url, is_paywalled, reprobe=False):
+    """
+    Count a scrape of the url's domain, and whether it was paywalled. A
+    re-probed domain that turns out not to be paywalled starts over.
+    """
+    domain = get_domain(url)
+    now = int(time.time())
+    try:
+        if reprobe and not is_paywalled:
+            print(f"{domain} wasn't paywalled this time, starting its stats over")
+            get_table(PAYWALLED_DOMAINS_TABLE).update_item(
+                Key={"domain": domain},
+                UpdateExpression="SET attempts = :one, paywalled = :zero, updated_at = :now",
+                ExpressionAttributeValues={":one": 1, ":zero": 0, ":now": now},
+            )
+        else:
+            get_table(PAYWALLED_DOMAINS_TABLE).update_item(
+                Key={"domain": domain},
+                UpdateExpression="ADD attempts :one, paywalled :paywalled SET updated_at = :now",
+                ExpressionAttributeValues={":one": 1, ":paywalled": 1 if is_paywalled else 0, ":now": now},
+            )
+    except ClientError as e:
+        error_code = e.response["Error"]["Code"]
+        error_message = e.response["Error"]["Message"]
+        print(f"DynamoDB error recording paywall outcome for {domain}: {error_code} - {error_message}")
+        raise e
+
+
+def find_near_duplicate(fingerprint, canonical_url):
+    """
+    Returns the url of a recently scraped article whose fingerprint is within
+    NEAR_DUPLICATE_MAX_DISTANCE bits of this one, or None. The same article
+    (by canonical url) being scraped again doesn't count.
+    """
+    now = int(time.time())
+    checked = set()
+    for band in get_bands(fingerprint, NEAR_DUPLICATE_MAX_DISTANCE, NEAR_DUPLICATE_KEY_BLOCKS):
+        for item in query_fingerprint_band(band):
+            # TTL deletion can lag by a day or two. A close match shows up
+            # under several bands, so only check each one once.
+            if int(item["expires_at"]) < now or item["canonical_url"] == canonical_url or item["fingerprint"] in checked:
+                continue
+            checked.add(item["fingerprint"])
+            distance = hamming_distance(fingerprint, int(item["fingerprint"], 16))
+            if distance <= NEAR_DUPLICATE_MAX_DISTANCE:
+                print(f"Fingerprint {fingerprint:016x} is {distance} bits from {item['url']}'s")
+                return item["url"]
+    return None
+
+
+def query_fingerprint_band(band):
+    items = []
+    try:
+        query_params = {"KeyConditionExpression": Key("band").eq(band)}
+        while True:
+            response = get_table(FINGERPRINTS_TABLE).query(**query_params)
+            items.extend(response.get("Items", []))
+            if "LastEvaluatedKey" not in response:
+                return items
+            query_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    except ClientError as e:
+        error_code = e.response["Error"]["Code"]
+        error_message = e.response["Error"]["Message"]
+        print(f"DynamoDB error querying fingerprint band {band}: {error_code} - {error_message}")
+        raise e
+
+
+def add_fingerprint(fingerprint, url, canonical_url):
+    """Index the fingerprint under each of its bands"""
+    now = int(time.time())
+    try:
+        with get_table(FINGERPRINTS_TABLE).batch_writer() as batch:
+            for band in get_bands(fingerprint, NEAR_DUPLICATE_MAX_DISTANCE, NEAR_DUPLICATE_KEY_BLOCKS):
+                batch.put_item(Item={
+                    "band": band,
+                    "fingerprint": f"{fingerprint:016x}",
+                    "url": url,
+                    "canonical_url": canonical_url,
+                    "updated_at": now,
+                    "expires_at": now + NEAR_DUPLICATE_SECS,
+                })
+    except ClientError as e:
+        error_code = e.response["Error"]["Code"]
+        error_message = e.response["Error"]["Message"]
+        print(f"DynamoDB error adding fingerprint for {url}: {error_code} - {error_message}")
+        raise e
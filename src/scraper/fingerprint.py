@@ -0,0 +1,68 @@
+import hashlib
+import re
+from collections import Counter
+from itertools import combinations
+
+SIMHASH_BITS = 64
+SHINGLE_WORDS = 3
+WORD_RE = re.compile(r"\w+")
+
+
+def get_shingles(text):
+    """Overlapping runs of SHINGLE_WORDS words, lowercased, with their counts"""
+    words = WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE_WORDS:
+        return Counter([" ".join(words)]) if words else Counter()
+    return Counter(" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1))
+
+
+def simhash(text):
+    """
+    A 64 bit SimHash of the text: texts that differ only a little (a different
+    byline, a sentence added or dropped) get fingerprints that differ in only
+    a few bits.
+    """
+    shingles = get_shingles(text)
+    hashes = [
+        (int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big"), count)
+        for (shingle, count) in shingles.items()
+    ]
+    total = sum(shingles.values())
+    fingerprint = 0
+    for bit in range(SIMHASH_BITS):
+        mask = 1 << bit
+        # the bit is set if more of the (weighted) shingles have it set than not
+        if 2 * sum(count for (h, count) in hashes if h & mask) > total:
+            fingerprint |= mask
+    return fingerprint
+
+
+def hamming_distance(a, b):
+    return (a ^ b).bit_count()
+
+
+def get_blocks(fingerprint, num_blocks):
+    """Split the fingerprint into num_blocks blocks of (nearly) equal numbers of bits"""
+    bounds = [i * SIMHASH_BITS // num_blocks for i in range(num_blocks + 1)]
+    return [
+        (fingerprint >> start) & ((1 << (end - start)) - 1)
+        for (start, end) in zip(bounds, bounds[1:])
+    ]
+
+
+def get_bands(fingerprint, max_distance, key_blocks):
+    """
+    The keys to index (and look up) the fingerprint under, so that any two
+    fingerprints up to max_distance bits apart share at least one key. The
+    fingerprint is split into max_distance + key_blocks blocks, and there's a
+    key per combination of key_blocks of them: at most max_distance blocks
+    can differ, so at least key_blocks are the same. More key_blocks means
+    wider keys, so each lookup matches less of the index, at the cost of more
+    keys per fingerprint. The settings are part of each key, so indexes built
+    with different settings don't mix.
+    """
+    blocks = get_blocks(fingerprint, max_distance + key_blocks)
+    return [
+        f"{max_distance}.{key_blocks}:{'.'.join(map(str, indexes))}:{'.'.join(f'{blocks[i]:x}' for i in indexes)}"
+        for indexes in combinations(range(len(blocks)), key_blocks)
+    ]
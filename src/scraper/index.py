@@ -1,23 +1,105 @@
+import importlib
 import json
+import time
 import traceback
-from app_settings import show_settings
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Time the imports, the bulk of a cold start, so we can keep an eye on them.
+# Dependencies come first so each module's time is mostly its own.
+IMPORT_TIMES = {}
+for timed_module_name in [
+    "boto3",
+    "requests",
+    "lxml.html",
+    "charset_normalizer",
+    "dailymail_shared.my_summarizer_bucket",
+    "app_settings",
+    "paywall",
+    "scrape",
+    "scrape_cache",
+    "fingerprint",
+    "db",
+    "politeness",
+    "app_queue",
+    "app",
+]:
+    import_start_time = time.time()
+    importlib.import_module(timed_module_name)
+    IMPORT_TIMES[timed_module_name] = time.time() - import_start_time
+
+# pylint: disable=wrong-import-position
+from app_settings import show_settings, SCRAPER_WORKERS, SCRAPER_EXTRACTOR, SCRAPER_MAX_DEFERS
 from app import process_record
+from scrape import show_connection_stats, import_unstructured
+from politeness import DeferFetch, interleave_by_domain, get_backoff_secs
+from app_queue import defer_message, get_defer_count
+
+# unstructured is imported on first use, unless it's the extractor we always
+# run, in which case get it over with during init
+if SCRAPER_EXTRACTOR == "unstructured":
+    import_start_time = time.time()
+    import_unstructured()
+    IMPORT_TIMES["unstructured"] = time.time() - import_start_time
+
+is_cold_start = True
+
+
+def show_import_times():
+    print(f"Cold start: imports took {sum(IMPORT_TIMES.values()):0.2f} seconds")
+    for module_name, secs in IMPORT_TIMES.items():
+        print(f"  {module_name}: {secs:0.2f} seconds")
 
 
 def handler(event, context):  # pylint: disable=unused-argument,redefined-outer-name
+    global is_cold_start  # pylint: disable=global-statement
     try:
         show_settings()
+        if is_cold_start:
+            show_import_times()
+            is_cold_start = False
         failed = []
-        for record in event["Records"]:
-            # Handle timeout exceptions, e.g.:
-            # requests.exceptions.ReadTimeout: HTTPSConnectionPool(host='www.emergentmind.com', port=443): Read timed out. (read timeout=20)
-            try:
-                process_record(record)
-            except Exception as e:
-                print(f"Exception processing record: {e}")
-                dump_stack_trace()
-                failed.append(record["messageId"])
+        # Spread each site's records out through the batch, rather than
+        # hitting it back to back
+        records = interleave_by_domain(event["Records"], get_record_url)
+        # Records are mostly waiting on downloads, so process them concurrently;
+        # the batch then takes about as long as its slowest record
+        with ThreadPoolExecutor(max_workers=SCRAPER_WORKERS) as executor:
+            futures = {
+                executor.submit(process_record, record): record
+                for record in records
+            }
+            for future in as_completed(futures):
+                record = futures[future]
+                # Handle timeout exceptions, e.g.:
+                # requests.exceptions.ReadTimeout: HTTPSConnectionPool(host='www.emergentmind.com', port=443): Read timed out. (read timeout=20)
+                # These, 429s and our own per-site rate limit come through as
+                # DeferFetch: put the record back on the queue for a while.
+                try:
+                    future.result()
+                except DeferFetch as e:
+                    defer_count = get_defer_count(record)
+                    if defer_count >= SCRAPER_MAX_DEFERS:
+                        # give up deferring, and let the queue's retries (and DLQ) have it
+                        print(f"Record {record['messageId']} has been deferred {defer_count} times, failing it: {e}")
+                        failed.append(record["messageId"])
+                        continue
+                    delay_secs = e.delay_secs
+                    if delay_secs is None:
+                        delay_secs = get_backoff_secs(defer_count + 1)
+                    print(f"Deferring record {record['messageId']} for {delay_secs:0.0f} seconds: {e}")
+                    try:
+                        # a delayed copy goes back on the queue, the original is done with
+                        defer_message(record, delay_secs)
+                    except Exception as defer_e:
+                        # it'll come back after the queue's visibility timeout instead
+                        print(f"Exception deferring record {record['messageId']}: {defer_e}")
+                        failed.append(record["messageId"])
+                except Exception as e:
+                    print(f"Exception processing record {record['messageId']}: {e}")
+                    dump_stack_trace()
+                    failed.append(record["messageId"])
 
+        show_connection_stats()
         return { "batchItemFailures": [{"itemIdentifier": f} for f in failed] } if failed else {}
 
 
@@ -27,6 +109,14 @@ def handler(event, context):  # pylint: disable=unused-argument,redefined-outer-
         raise e
 
 
+def get_record_url(sqs_record):
+    try:
+        return json.loads(sqs_record["body"])["url"]
+    except (ValueError, KeyError, TypeError):
+        # process_record will complain about it
+        return ""
+
+
 def dump_stack_trace():
     stack_trace = traceback.format_exc()
     print("=== BEGIN stack trace ===")
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+# Micro-benchmark of the paywall detector: how long the compiled signature
+# regex takes to scan a page's text, against the old loop of `in` checks, as
+# the number of signatures grows. Run from src/scraper:
+#   python misc/benchmark_paywall_detector.py
+
+import os
+import random
+import string
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+# paywall.py creates an SSM client at import; it isn't used here
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-west-2")
+
+from paywall import compile_signatures  # pylint: disable=wrong-import-position
+
+random.seed(42)
+WORDS = ["".join(random.choices(string.ascii_lowercase, k=random.randint(2, 10))) for _ in range(5000)]
+
+
+def make_sentence(num_words):
+    return " ".join(random.choices(WORDS, k=num_words)).capitalize()
+
+
+def make_page(num_chars):
+    # a page's worth of text, in pieces, like an extraction's texts
+    texts = []
+    while sum(len(text) for text in texts) < num_chars:
+        texts.append(make_sentence(random.randint(10, 40)) + ".")
+    return texts
+
+
+def naive_find(signatures, texts):
+    for text in texts:
+        for signature in signatures:
+            if signature in text:
+                return signature
+    return None
+
+
+def compiled_find(regex, texts):
+    for text in texts:
+        match = regex.search(text)
+        if match:
+            return match.group(0)
+    return None
+
+
+def main():
+    page = make_page(200_000)
+    print(f"Page: {sum(len(text) for text in page)} chars in {len(page)} pieces, no signature present")
+    print(f"{'signatures':>10} {'compile ms':>11} {'naive ms':>9} {'compiled ms':>12}")
+    for num_signatures in [2, 10, 50, 100, 250, 500, 1000]:
+        signatures = [make_sentence(random.randint(3, 8)) for _ in range(num_signatures)]
+        compile_secs = timeit.timeit(lambda: compile_signatures(signatures), number=1)
+        regex = compile_signatures(signatures)
+        assert naive_find(signatures, page) is None and compiled_find(regex, page) is None
+        naive_secs = min(timeit.repeat(lambda: naive_find(signatures, page), number=1, repeat=3))
+        compiled_secs = min(timeit.repeat(lambda: compiled_find(regex, page), number=1, repeat=3))
+        print(
+            f"{num_signatures:>10} {compile_secs * 1000:>11.1f} "
+            f"{naive_secs * 1000:>9.1f} {compiled_secs * 1000:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
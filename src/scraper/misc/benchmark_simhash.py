@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+# Micro-benchmark of the near-duplicate fingerprint: how long simhash() takes
+# per KB of text, how many bits apart a lightly edited copy of a text lands
+# compared with an unrelated one, and for each candidate
+# NEAR_DUPLICATE_MAX_DISTANCE, the recall (edited copies caught), precision
+# (matches that really are copies), and what share of the whole fingerprint
+# index each lookup has to read (its bands are that much less selective).
+# Run from src/scraper:
+#   python misc/benchmark_simhash.py
+
+import os
+import random
+import string
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fingerprint import SIMHASH_BITS, simhash, hamming_distance, get_bands  # pylint: disable=wrong-import-position
+
+random.seed(42)
+WORDS = ["".join(random.choices(string.ascii_lowercase, k=random.randint(2, 10))) for _ in range(5000)]
+
+
+def make_article(num_chars):
+    sentences = []
+    while sum(len(sentence) for sentence in sentences) < num_chars:
+        sentences.append(" ".join(random.choices(WORDS, k=random.randint(8, 30))).capitalize() + ".")
+    return sentences
+
+
+def edit(sentences, num_edits):
+    # what syndication typically does: a different intro line, a sentence
+    # dropped, a few words changed
+    edited = list(sentences)
+    edited[0] = "By a different staff writer, for a different outlet."
+    for _ in range(num_edits):
+        i = random.randrange(len(edited))
+        if random.random() < 0.5:
+            del edited[i]
+        else:
+            words = edited[i].split()
+            words[random.randrange(len(words))] = random.choice(WORDS)
+            edited[i] = " ".join(words)
+    return edited
+
+
+def main():
+    print(f"{'KB':>5} {'ms':>7} {'ms/KB':>6}")
+    for num_chars in [1_000, 5_000, 20_000, 50_000]:
+        text = " ".join(make_article(num_chars))
+        secs = min(timeit.repeat(lambda: simhash(text), number=1, repeat=5))
+        print(f"{len(text) / 1024:>5.0f} {secs * 1000:>7.1f} {secs * 1000 / (len(text) / 1024):>6.2f}")
+
+    print()
+    print(f"{'KB':>5} {'edits':>5} {'near-duplicate bits':>20} {'unrelated bits':>15}")
+    near_by_edits, unrelated = {}, []
+    for num_chars in [2_000, 5_000, 10_000, 20_000]:
+        for num_edits in [0, 1, 3]:
+            near = []
+            for _ in range(50):
+                article = make_article(num_chars)
+                fingerprint = simhash(" ".join(article))
+                near.append(hamming_distance(fingerprint, simhash(" ".join(edit(article, num_edits)))))
+                unrelated.append(hamming_distance(fingerprint, simhash(" ".join(make_article(num_chars)))))
+            near_by_edits.setdefault(num_edits, []).extend(near)
+            print(
+                f"{num_chars / 1000:>5.0f} {num_edits:>5} {sum(near) / len(near):>13.1f} (max {max(near):>2}) "
+                f"{sum(unrelated[-50:]) / 50:>8.1f} (min {min(unrelated[-50:]):>2})"
+            )
+
+    print()
+    print(
+        f"{'max distance':>12} {'key blocks':>10} {'keys':>4} {'key bits':>8} "
+        f"{'recall (0/1/3 edits)':>22} {'precision':>9} {'index read':>10}"
+    )
+    for max_distance in range(1, 11):
+        for key_blocks in [1, 2]:
+            keys = len(get_bands(0, max_distance, key_blocks))
+            num_blocks = max_distance + key_blocks
+            bounds = [i * SIMHASH_BITS // num_blocks for i in range(num_blocks + 1)]
+            key_bits = sum(sorted(end - start for (start, end) in zip(bounds, bounds[1:]))[:key_blocks])
+            recalls = [
+                sum(1 for d in near_by_edits[num_edits] if d <= max_distance) / len(near_by_edits[num_edits])
+                for num_edits in sorted(near_by_edits)
+            ]
+            # precision against as many unrelated pairs as near-duplicate ones
+            true_matches = sum(1 for near in near_by_edits.values() for d in near if d <= max_distance)
+            false_matches = sum(1 for d in unrelated if d <= max_distance)
+            precision = true_matches / (true_matches + false_matches) if true_matches else 0
+            # the share of all stored fingerprints a lookup's queries read (at
+            # most: some keys may be a bit wider)
+            print(
+                f"{max_distance:>12} {key_blocks:>10} {keys:>4} {key_bits:>8} "
+                f"{' '.join(f'{r:>6.0%}' for r in recalls):>22} {precision:>9.0%} "
+                f"{keys / 2 ** key_bits:>10.4%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import json
+import re
+import threading
+import time
+from urllib.parse import urlparse
+import boto3
+from app_settings import PAYWALL_TEXTS, PAYWALL_SIGNATURES_PARAMETER_NAME, PAYWALL_SIGNATURES_REFRESH_SECS
+
+ssm = boto3.client("ssm")
+
+# The signatures, by domain, as last loaded from the parameter store, when,
+# and the regexes compiled from them, by host. Replaced as a whole on reload.
+paywall_signatures = {"by_domain": {}, "loaded_at": 0, "regexes": {}}
+paywall_signatures_lock = threading.Lock()
+
+
+def load_paywall_signatures():
+    """
+    The parameter holds a JSON object of signature lists by domain, with "*"
+    for signatures that apply everywhere, e.g.
+        {"*": ["Subscribe to keep reading"], "nytimes.com": ["..."]}
+    PAYWALL_TEXTS always apply, and are all we have if the parameter is
+    missing or unreadable. Anything but a list of non-empty strings is
+    skipped: a bare string, or an empty one, would match every page.
+    """
+    signatures = {"*": list(PAYWALL_TEXTS)}
+    try:
+        parameter = ssm.get_parameter(Name=PAYWALL_SIGNATURES_PARAMETER_NAME)
+        for domain, texts in json.loads(parameter["Parameter"]["Value"]).items():
+            if not isinstance(texts, list):
+                print(f"Skipping paywall signatures for {domain}: expected a list, got {texts!r}")
+                continue
+            for text in texts:
+                if not isinstance(text, str) or not text.strip():
+                    print(f"Skipping paywall signature for {domain}: {text!r}")
+                    continue
+                signatures.setdefault(domain.lower(), []).append(text)
+    except Exception as e:
+        print(f"Could not load paywall signatures from {PAYWALL_SIGNATURES_PARAMETER_NAME}, using the defaults: {e}")
+    print(f"Loaded {sum(len(texts) for texts in signatures.values())} paywall signatures for {len(signatures)} domains")
+    return signatures
+
+
+def get_paywall_signatures():
+    """The signatures, reloaded every PAYWALL_SIGNATURES_REFRESH_SECS"""
+    global paywall_signatures  # pylint: disable=global-statement
+    with paywall_signatures_lock:
+        if time.time() - paywall_signatures["loaded_at"] > PAYWALL_SIGNATURES_REFRESH_SECS:
+            paywall_signatures = {"by_domain": load_paywall_signatures(), "loaded_at": time.time(), "regexes": {}}
+        return paywall_signatures
+
+
+def get_domain_chain(host):
+    """e.g. www.example.co.uk -> [www.example.co.uk, example.co.uk, co.uk, uk]"""
+    labels = host.lower().rstrip(".").split(".")
+    return [".".join(labels[i:]) for i in range(len(labels))]
+
+
+def get_paywall_regex(signatures, host):
+    """
+    Compile the signatures that apply to a host (its own, its parent domains'
+    and the global ones) into a single regex, so the page's text is scanned
+    once however many signatures there are. Compiled once per host.
+    """
+    if host not in signatures["regexes"]:
+        by_domain = signatures["by_domain"]
+        texts = set(by_domain.get("*", []))
+        for domain in get_domain_chain(host):
+            texts.update(by_domain.get(domain, []))
+        signatures["regexes"][host] = compile_signatures(texts) if texts else None
+    return signatures["regexes"][host]
+
+
+def compile_signatures(signatures):
+    """
+    One regex matching any of the signatures, literally. The alternatives are
+    built as a trie, so the regex engine follows one branch per character
+    rather than trying every signature at every position.
+    """
+    trie = {}
+    for signature in signatures:
+        node = trie
+        for char in signature:
+            node = node.setdefault(char, {})
+        node[""] = True
+    return re.compile(trie_to_pattern(trie))
+
+
+def trie_to_pattern(node):
+    # "" marks the end of a signature; matching the shortest is enough,
+    # we only want to know whether any matched
+    if "" in node:
+        return ""
+    branches = [re.escape(char) + trie_to_pattern(child) for (char, child) in sorted(node.items())]
+    if len(branches) == 1:
+        return branches[0]
+    return "(?:" + "|".join(branches) + ")"
+
+
+def find_paywall_text(url, texts):
+    """
+    Returns the first paywall signature found in the page's texts, or None.
+    """
+    regex = get_paywall_regex(get_paywall_signatures(), urlparse(url).hostname or "")
+    if regex is None:
+        return None
+    for text in texts:
+        match = regex.search(text)
+        if match:
+            return match.group(0)
+    return None
@@ -0,0 +1,122 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from itertools import zip_longest
+from dailymail_shared.my_urls import get_domain
+from app_settings import (
+    SCRAPER_DOMAIN_RATE,
+    SCRAPER_DOMAIN_BURST,
+    SCRAPER_DOMAIN_MAX_WAIT_SECS,
+    SCRAPER_DEFER_BASE_SECS,
+    SCRAPER_DEFER_MAX_SECS,
+)
+
+
+class DeferFetch(Exception):
+    """
+    Raised to put a record back on the queue for later, rather than failing
+    it: the site is throttling us, or we're throttling ourselves. delay_secs
+    is how long to wait, or None to back off by how often it's been tried.
+    """
+    def __init__(self, message, delay_secs=None):
+        super().__init__(message)
+        self.delay_secs = delay_secs
+
+
+class TokenBucket:
+    """
+    Allows SCRAPER_DOMAIN_RATE requests per second, with bursts of up to
+    SCRAPER_DOMAIN_BURST. Tokens can go negative: each caller reserves the
+    next token and waits until it's due.
+    """
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        # Set from a Retry-After: no requests at all until then
+        self.blocked_until = 0
+
+    def reserve(self, now):
+        """Take a token, and return how long to wait before using it"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        return max(wait, self.blocked_until - now)
+
+    def cancel(self):
+        self.tokens += 1
+
+
+# By domain, for the life of the container, so a warm start remembers a
+# Retry-After from the previous batch
+buckets = {}
+buckets_lock = threading.Lock()
+
+
+def get_bucket(domain):
+    if domain not in buckets:
+        buckets[domain] = TokenBucket(SCRAPER_DOMAIN_RATE, SCRAPER_DOMAIN_BURST)
+    return buckets[domain]
+
+
+def wait_for_domain(url):
+    """
+    Wait for our turn to fetch from the url's domain. If that would take
+    longer than SCRAPER_DOMAIN_MAX_WAIT_SECS, raise DeferFetch instead.
+    """
+    domain = get_domain(url)
+    with buckets_lock:
+        bucket = get_bucket(domain)
+        wait = bucket.reserve(time.monotonic())
+        if wait > SCRAPER_DOMAIN_MAX_WAIT_SECS:
+            bucket.cancel()
+            raise DeferFetch(f"{domain} is busy for another {wait:0.0f} seconds", wait)
+    if wait > 0:
+        print(f"Waiting {wait:0.1f} seconds for our turn at {domain}")
+        time.sleep(wait)
+
+
+def block_domain(url, secs):
+    """Stop fetching from the url's domain for a while, e.g. per a Retry-After"""
+    domain = get_domain(url)
+    with buckets_lock:
+        bucket = get_bucket(domain)
+        bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + secs)
+
+
+def parse_retry_after(value):
+    """A Retry-After header's delay in seconds, or None if there's none"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    try:
+        return max(0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def get_backoff_secs(attempt):
+    """Exponential backoff with full jitter, for the given (1-based) attempt"""
+    return random.uniform(0, min(SCRAPER_DEFER_MAX_SECS, SCRAPER_DEFER_BASE_SECS * 2 ** (attempt - 1)))
+
+
+def interleave_by_domain(items, get_url):
+    """
+    Reorder items so consecutive ones are for different domains where
+    possible (round robin across domains, in order of first appearance),
+    rather than hitting one site back to back.
+    """
+    by_domain = {}
+    for item in items:
+        by_domain.setdefault(get_domain(get_url(item)), []).append(item)
+    return [
+        item
+        for round_items in zip_longest(*by_domain.values())
+        for item in round_items
+        if item is not None
+    ]
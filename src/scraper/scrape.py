@@ -1,90 +1,609 @@
-import shutil
+import codecs
+import functools
+import re
+import socket
+import ssl
 import tempfile
+import threading
 import time
+from collections import Counter
+from email.message import Message
+from typing import NamedTuple
+from urllib.parse import urlparse, unquote
 import requests
-from unstructured.partition.html import partition_html
-from unstructured.documents.elements import NarrativeText
-from bs4 import BeautifulSoup
-from app_settings import PAYWALL_TEXTS
+from requests.adapters import HTTPAdapter
+from charset_normalizer import from_bytes
+import lxml.html
+from lxml import etree
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+from urllib3.exceptions import NameResolutionError
+from paywall import find_paywall_text
+from politeness import DeferFetch, wait_for_domain, block_domain, parse_retry_after
+from app_settings import (
+    SCRAPER_PARSE_WORKERS,
+    SCRAPER_EXTRACTOR,
+    FAST_EXTRACTOR_MIN_CONFIDENCE,
+    SCRAPER_MAX_DOWNLOAD_BYTES,
+    SCRAPER_MAX_CONTENT_CHARS,
+    SCRAPER_CONTENT_TYPES,
+    SCRAPER_MAX_PDF_BYTES,
+    SCRAPER_MAX_PDF_PAGES,
+    SCRAPER_POOL_HOSTS,
+    SCRAPER_POOL_PER_HOST,
+    SCRAPER_HTTP_RETRIES,
+)
+
+# Downloads run concurrently, but limit how many records parse at once: parsing
+# is CPU bound (so more threads than cores doesn't help) and memory hungry.
+# Lambda has no /dev/shm, so a multiprocessing pool isn't an option.
+parse_semaphore = threading.BoundedSemaphore(SCRAPER_PARSE_WORKERS)
+
+# Count every new TCP connection (and TLS handshake) per host. urllib3's own
+# pool.num_connections only counts connection objects, which get silently
+# reconnected when a server drops a kept-alive connection.
+new_connections = Counter()
+new_connections_lock = threading.Lock()
+
+
+class CountingHTTPConnection(HTTPConnection):
+    """An HTTPConnection that counts each new connection in new_connections"""
+
+    def connect(self):
+        with new_connections_lock:
+            new_connections[self.host] += 1
+        super().connect()
+
+
+class CountingHTTPSConnection(HTTPSConnection):
+    """An HTTPSConnection that counts each new connection in new_connections"""
+
+    def connect(self):
+        with new_connections_lock:
+            new_connections[self.host] += 1
+        super().connect()
+
+
+class CountingHTTPConnectionPool(HTTPConnectionPool):
+    """An HTTPConnectionPool of CountingHTTPConnections"""
+    ConnectionCls = CountingHTTPConnection
+
+
+class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    """An HTTPSConnectionPool of CountingHTTPSConnections"""
+    ConnectionCls = CountingHTTPSConnection
+
+
+# One session for the life of the container, so connections (and their TLS
+# handshakes) are reused across records, batches and warm invocations
+session = requests.Session()
+session.headers.update({
+    # Provide a browser-like User-Agent so we don't get blocked as a scraper
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/111.0.0.0 Safari/537.36",
+    # Ask for whichever compressions urllib3 can decode here (gzip and
+    # deflate, plus br when Brotli is installed); we decompress while
+    # streaming and only ever hand decoded text to the extractor.
+    "Accept-Encoding": ACCEPT_ENCODING,
+})
+http_adapter = HTTPAdapter(
+    pool_connections=SCRAPER_POOL_HOSTS,
+    pool_maxsize=SCRAPER_POOL_PER_HOST,
+    max_retries=Retry(
+        total=SCRAPER_HTTP_RETRIES,
+        backoff_factor=0.5,
+        # 429s and 503s are deferred instead, however long their Retry-After,
+        # see fetch_and_extract
+        status_forcelist=[500, 502, 504],
+        respect_retry_after_header=False,
+        allowed_methods=["GET"],
+        # hand back the last response rather than raising, like without retries
+        raise_on_status=False,
+    ),
+)
+http_adapter.poolmanager.pool_classes_by_scheme = {
+    "http": CountingHTTPConnectionPool,
+    "https": CountingHTTPSConnectionPool,
+}
+session.mount("http://", http_adapter)
+session.mount("https://", http_adapter)
+
+TITLE_SCAN_CHUNK_SIZE = 16 * 1024
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# PDFs are downloaded into memory up to this size, then spill over into /tmp
+PDF_SPOOL_MAX_MEMORY_BYTES = 4 * 1024 * 1024
+PDF_CONTENT_TYPES = ["application/pdf", "application/x-pdf"]
+# Servers sometimes label PDFs with these, so go by the url's extension
+GENERIC_CONTENT_TYPES = ["application/octet-stream", "binary/octet-stream", "application/download"]
+META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset=["']?([\w.:-]+)""", re.IGNORECASE)
+# lxml refuses to parse a (decoded) str that declares its own encoding, as
+# XHTML pages do; we've already decoded it, so the declaration can go
+XML_DECLARATION_RE = re.compile(r"^[\s\ufeff]*<\?xml[^>]*\?>")
+
+# For the fast extractor: elements whose text never belongs in the article, and
+# class/id names that mark page furniture rather than the article body
+NON_CONTENT_TAGS = ["script", "style", "noscript", "template", "svg", "iframe", "object", "embed"]
+BOILERPLATE_TAGS = ["nav", "header", "footer", "aside", "form", "button", "select", "figcaption"]
+BOILERPLATE_RE = re.compile(
+    r"comment|sidebar|footer|masthead|menu|navbar|breadcrumb|share|social|promo|related|"
+    r"recommend|advert|sponsor|cookie|newsletter|signup|popup|modal|byline|author-bio|tags",
+    re.IGNORECASE,
+)
+PARAGRAPH_TAGS = ["p", "pre", "blockquote", "li"]
+MIN_PARAGRAPH_CHARS = 40
+MAX_LINK_DENSITY = 0.5
+FAST_EXTRACTOR_TARGET_CHARS = 800
+
+
+class Extraction(NamedTuple):
+    """What an extractor found in a page"""
+    title: str
+    # the article's narrative text, one piece per paragraph
+    paragraphs: list
+    # the text of the whole page, pieces of it anyway, for paywall detection
+    texts: list
+    # how sure the extractor is that it found the article, 0 to 1
+    confidence: float
 
 
 def extract_title_from_html(html):
-    """Extract the title from the HTML text"""
-    soup = BeautifulSoup(html, "lxml")
-    if soup.title is None:
-        return "Unknown"
-    return soup.title.string
+    """
+    Extract the title from the HTML. This uses a pull parser that stops
+    as soon as it has seen the <title>, rather than parsing the whole document
+    a second time.
+    """
+    parser = etree.HTMLPullParser(events=("end",), tag="title")
+    for i in range(0, len(html), TITLE_SCAN_CHUNK_SIZE):
+        parser.feed(html[i:i + TITLE_SCAN_CHUNK_SIZE])
+        for (_, element) in parser.read_events():
+            if element.text and element.text.strip():
+                return element.text.strip()
+    return "Unknown"
+
+
+def get_charset(response, html_bytes):
+    """
+    Work out how the page is encoded: the Content-Type header's charset, else
+    a <meta charset> near the top of the page, else detect it from the bytes.
+    """
+    message = Message()
+    message["content-type"] = response.headers.get("Content-Type", "")
+    candidates = [message.get_content_charset()]
+    match = META_CHARSET_RE.search(html_bytes[:4096])
+    if match:
+        candidates.append(match.group(1).decode("ascii"))
+    for charset in candidates:
+        if charset:
+            try:
+                return codecs.lookup(charset).name
+            except LookupError:
+                pass
+    best = from_bytes(html_bytes[:64 * 1024]).best()
+    return best.encoding if best else "utf-8"
+
+
+def extract_with_lxml(html, max_chars=SCRAPER_MAX_CONTENT_CHARS) -> Extraction:
+    """
+    A fast, readability-style extractor: parse the page once with lxml, take
+    the title from that tree, score each block by the paragraph text directly
+    inside it, and keep the paragraphs of the best scoring block (plus any
+    sibling blocks that score nearly as well).
+    """
+    html = XML_DECLARATION_RE.sub("", html)
+    if not html.strip():
+        return Extraction("Unknown", [], [], 0.0)
+    tree = lxml.html.document_fromstring(html)
+
+    title = (tree.findtext(".//title") or "").strip() or "Unknown"
+
+    for element in list(tree.iter(*NON_CONTENT_TAGS)):
+        element.drop_tree()
+    # The paywall check looks at everything that's visible, boilerplate included
+    texts = [tree.text_content()]
+
+    for element in list(tree.iter(*BOILERPLATE_TAGS)):
+        element.drop_tree()
+    for element in list(tree.iter()):
+        if not isinstance(element.tag, str) or element.getparent() is None:
+            continue
+        names = f"{element.get('class', '')} {element.get('id', '')}"
+        if names.strip() and BOILERPLATE_RE.search(names) and element.tag not in ("body", "article", "main"):
+            element.drop_tree()
+
+    # Score each paragraph's parent (and, less so, grandparent) by its text
+    scores = {}
+    for paragraph in tree.iter(*PARAGRAPH_TAGS):
+        text = paragraph.text_content().strip()
+        if len(text) < MIN_PARAGRAPH_CHARS:
+            continue
+        score = 1 + text.count(",") + min(len(text) / 100, 3)
+        parent = paragraph.getparent()
+        if parent is not None:
+            scores[parent] = scores.get(parent, 0) + score
+            grandparent = parent.getparent()
+            if grandparent is not None:
+                scores[grandparent] = scores.get(grandparent, 0) + score / 2
+
+    if not scores:
+        return Extraction(title, [], texts, 0.0)
+
+    best = max(scores, key=scores.get)
+    blocks = [best]
+    parent = best.getparent()
+    if parent is not None:
+        blocks = [
+            sibling for sibling in parent
+            if sibling is best or scores.get(sibling, 0) >= scores[best] * 0.2
+        ]
+
+    paragraphs = []
+    total_chars = 0
+    for block in blocks:
+        for paragraph in block.iter(*PARAGRAPH_TAGS):
+            # skip list items and quotes that hold paragraphs of their own,
+            # they'll be picked up as those paragraphs
+            if paragraph.tag != "p" and paragraph.find(".//p") is not None:
+                continue
+            text = " ".join(paragraph.text_content().split())
+            if len(text) < MIN_PARAGRAPH_CHARS:
+                continue
+            link_text = sum(len(a.text_content()) for a in paragraph.iter("a"))
+            if link_text / len(text) > MAX_LINK_DENSITY:
+                continue
+            paragraphs.append(text)
+            total_chars += len(text)
+            if total_chars >= max_chars:
+                break
+        if total_chars >= max_chars:
+            break
+
+    confidence = min(1.0, total_chars / FAST_EXTRACTOR_TARGET_CHARS) * min(1.0, len(paragraphs) / 3)
+    return Extraction(title, paragraphs, texts, confidence)
+
+
+@functools.cache
+def import_unstructured():
+    """
+    unstructured (and the NLTK, numpy etc. it pulls in) takes seconds to
+    import, and it's only needed when the fast extractor isn't confident, so
+    don't import it until then.
+    """
+    start_time = time.time()
+    # pylint: disable=import-outside-toplevel
+    from unstructured.partition.html import partition_html
+    from unstructured.documents.elements import NarrativeText
+    end_time = time.time()
+    print(f"Importing unstructured took {(end_time - start_time):0.1f} seconds")
+    return (partition_html, NarrativeText)
+
+
+def extract_with_unstructured(html, max_chars=SCRAPER_MAX_CONTENT_CHARS) -> Extraction:
+    """
+    The thorough but slow extractor: unstructured's partition_html, keeping
+    only the NarrativeText elements. It always reports full confidence.
+    """
+    (partition_html, NarrativeText) = import_unstructured()  # pylint: disable=invalid-name
+    elements = partition_html(text=html)
+    # I cannot figure out how to get the HTML title using unstructured.
+    title = extract_title_from_html(html)
+    # See: https://docs.unstructured.io/api-reference/api-services/document-elements
+    # Collect text from NarrativeText elements only, for now. Title seems to
+    # get too much garbage. For the paywall check, use all element types.
+    paragraphs = []
+    total_chars = 0
+    for element in elements:
+        if isinstance(element, (NarrativeText,)):
+            paragraphs.append(str(element))
+            total_chars += len(paragraphs[-1])
+            if total_chars >= max_chars:
+                break
+    texts = [str(element) for element in elements]
+    return Extraction(title, paragraphs, texts, 1.0)
+
+
+# Extractors, by name. SCRAPER_EXTRACTOR picks the one to try first; when it's
+# not confident it found the article, fall back to unstructured.
+EXTRACTORS = {
+    "fast": extract_with_lxml,
+    "unstructured": extract_with_unstructured,
+}
+FALLBACK_EXTRACTOR = "unstructured"
+
+
+def extract_article(html):
+    """Returns (extractor name, Extraction)"""
+    name = SCRAPER_EXTRACTOR
+    start_time = time.time()
+    try:
+        extraction = EXTRACTORS[name](html)
+        end_time = time.time()
+        print(f"Extractor {name} took {(end_time - start_time):0.1f} seconds, confidence {extraction.confidence:0.2f}")
+    except (ValueError, etree.ParserError) as e:
+        # e.g. "Document is empty" for a page that's nothing but a comment
+        if name == FALLBACK_EXTRACTOR:
+            raise e
+        print(f"Extractor {name} couldn't parse the page: {e}")
+        extraction = None
+
+    if extraction is None or (extraction.confidence < FAST_EXTRACTOR_MIN_CONFIDENCE and name != FALLBACK_EXTRACTOR):
+        name = FALLBACK_EXTRACTOR
+        start_time = time.time()
+        extraction = EXTRACTORS[name](html)
+        end_time = time.time()
+        print(f"Extractor {name} took {(end_time - start_time):0.1f} seconds")
+
+    return (name, extraction)
+
+
+def get_connection_stats():
+    """
+    Per host, how many requests the session has sent and over how many new
+    connections, since the container started; the difference is how many
+    requests reused a connection. Only covers hosts still in the pool manager
+    (the SCRAPER_POOL_HOSTS most recently used).
+    """
+    stats = {}
+    pools = http_adapter.poolmanager.pools
+    for key in pools.keys():
+        pool = pools.get(key)
+        if pool is not None:
+            stats[pool.host] = stats.get(pool.host, 0) + pool.num_requests
+    with new_connections_lock:
+        return {host: (num_requests, new_connections[host]) for host, num_requests in stats.items()}
+
+
+def show_connection_stats():
+    stats = get_connection_stats()
+    total_requests = sum(num_requests for (num_requests, _) in stats.values())
+    total_connections = sum(num_connections for (_, num_connections) in stats.values())
+    print(
+        f"HTTP connections: {total_requests} requests over {total_connections} connections "
+        f"({total_requests - total_connections} reused) to {len(stats)} hosts"
+    )
+    for host, (num_requests, num_connections) in sorted(stats.items()):
+        print(f"  {host}: {num_requests} requests over {num_connections} connections")
+
+
+def get_content_kind(response, url):
+    """
+    "html" or "pdf", by the response's Content-Type, or None if it's neither
+    and so not something we can scrape. A missing Content-Type gets the
+    benefit of the doubt, as does a generic one on a url ending in .pdf.
+    """
+    content_type = response.headers.get("Content-Type")
+    if not content_type:
+        return "pdf" if is_pdf_url(url) else "html"
+    mime_type = content_type.split(";")[0].strip().lower()
+    if mime_type in SCRAPER_CONTENT_TYPES:
+        return "html"
+    if mime_type in PDF_CONTENT_TYPES:
+        return "pdf"
+    if mime_type in GENERIC_CONTENT_TYPES and is_pdf_url(url):
+        return "pdf"
+    return None
+
+
+def is_pdf_url(url):
+    return urlparse(url).path.lower().endswith(".pdf")
+
+
+def download_capped(response, max_bytes):
+    """
+    Read the (decompressed) response body into memory, rather than
+    round-tripping it through a temp file, stopping at max_bytes. A page cut
+    short still parses fine, and the text past that point would be dropped by
+    the summarizer anyway.
+    """
+    chunks = []
+    size = 0
+    # iter_content decompresses as it streams
+    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= max_bytes:
+            print(f"Stopped downloading at {size} bytes (max {max_bytes})")
+            response.close()
+            break
+    return b"".join(chunks)[:max_bytes]
+
+
+def import_pypdf():
+    """Only needed for the odd PDF, so only imported then"""
+    # pylint: disable=import-outside-toplevel
+    import pypdf
+    return pypdf
+
+
+def download_to_spooled_file(response, max_bytes):
+    """
+    Stream the response body into a file that stays in memory while it's
+    small and moves to /tmp when it isn't. Returns None if the body turns
+    out to be over max_bytes: unlike HTML, a PDF cut short can't be read, its
+    index of objects is at the end.
+    """
+    # Not a with: the open file is handed back, for the caller to close
+    spooled_file = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_MAX_MEMORY_BYTES)  # pylint: disable=consider-using-with
+    size = 0
+    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_bytes:
+            print(f"Stopped downloading at {size} bytes (max {max_bytes})")
+            response.close()
+            spooled_file.close()
+            return None
+        spooled_file.write(chunk)
+    spooled_file.seek(0)
+    return spooled_file
+
+
+def extract_pdf_text(url, pdf_file, max_pages=SCRAPER_MAX_PDF_PAGES, max_chars=SCRAPER_MAX_CONTENT_CHARS):
+    """
+    Returns (title, page texts) from a PDF, reading pages in order and
+    stopping after max_pages, or once there's max_chars of text. pypdf only
+    parses a page when it's asked for, so the pages past that cost nothing.
+    """
+    pypdf = import_pypdf()
+    reader = pypdf.PdfReader(pdf_file, strict=False)
+    title = None
+    if reader.metadata and reader.metadata.title:
+        title = reader.metadata.title.strip()
+    if not title:
+        # Often the best there is; the summarizer writes its own title anyway
+        title = unquote(urlparse(url).path.rsplit("/", 1)[-1]) or "Unknown"
+
+    pieces = []
+    total_chars = 0
+    pages_read = 0
+    num_pages = len(reader.pages)
+    for page_number in range(min(num_pages, max_pages)):
+        text = (reader.pages[page_number].extract_text() or "").strip()
+        pages_read += 1
+        if not text:
+            continue
+        pieces.append(text)
+        total_chars += len(text)
+        if total_chars >= max_chars:
+            break
+    print(f"Extracted {total_chars} chars from {pages_read} of {num_pages} pages")
+    return (title, pieces)
+
+
+def fetch_pdf_content(url, response, start_time):
+    content_length = response.headers.get("Content-Length")
+    if content_length and content_length.isdigit() and int(content_length) > SCRAPER_MAX_PDF_BYTES:
+        print(f"Content-Length is {content_length}, too big a PDF (max {SCRAPER_MAX_PDF_BYTES}), not scraping it")
+        response.close()
+        return ("Unknown", "", False)
+
+    pdf_file = download_to_spooled_file(response, SCRAPER_MAX_PDF_BYTES)
+    end_time = time.time()
+    if pdf_file is None:
+        return ("Unknown", "", False)
+    print(f"Downloading PDF ({response.raw.tell()} bytes) took {(end_time - start_time):0.1f} seconds")
+
+    pypdf = import_pypdf()
+    with pdf_file:
+        with parse_semaphore:
+            start_time = time.time()
+            try:
+                (title, pieces) = extract_pdf_text(url, pdf_file)
+            except pypdf.errors.PdfReadError as e:
+                # retrying won't fix a broken PDF
+                print(f"Could not read the PDF: {e}")
+                return ("Unknown", "", False)
+            end_time = time.time()
+            print(f"Extracting PDF text took {(end_time - start_time):0.1f} seconds")
+
+    content = "\n".join(pieces)[:SCRAPER_MAX_CONTENT_CHARS]
+    # PDFs aren't paywalled: if we got one at all, we got all of it
+    return (title, content, False)
 
 
 def fetch_site_content(url):
-    print(f"Now fetching {url}...")
-    page_title = "Unknown"
-    body_pieces = []
+    """
+    Returns (title, content, is_paywalled). Raises DeferFetch if the site is
+    busy (by our own per-domain rate limit, or its 429s and 503s) or
+    unreachable for now (timeouts, connections refused or reset), so the
+    record can be tried again later. TLS and DNS failures won't get better
+    by waiting, so those fail right away.
+    """
+    wait_for_domain(url)
+    try:
+        return fetch_and_extract(url)
+    except (
+        requests.exceptions.Timeout,
+        requests.exceptions.ConnectionError,
+        requests.exceptions.ChunkedEncodingError,
+    ) as e:
+        if is_permanent_fetch_error(e):
+            raise e
+        raise DeferFetch(f"Fetching {url} failed: {e}") from e
+
+
+def is_permanent_fetch_error(e):
+    """
+    Whether a requests exception is down to a bad certificate or an unknown
+    host. requests wraps urllib3's exceptions, which wrap the underlying
+    ones, so look through the whole chain.
+    """
+    seen = set()
+    pending = [e]
+    while pending:
+        error = pending.pop()
+        if error is None or id(error) in seen:
+            continue
+        seen.add(id(error))
+        if isinstance(error, (requests.exceptions.SSLError, ssl.SSLError, NameResolutionError, socket.gaierror)):
+            return True
+        pending.extend([error.__cause__, error.__context__, getattr(error, "reason", None)])
+        pending.extend(arg for arg in getattr(error, "args", ()) if isinstance(arg, BaseException))
+    return False
 
-    headers = {
-        # Provide a browser-like User-Agent so we don't get blocked as a scraper
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/111.0.0.0 Safari/537.36",
-        # don't gzip it, unstructured cannot handle gzipped docs
-        "Accept-Encoding": "identity",
-    }
+
+def fetch_and_extract(url):
+    print(f"Now fetching {url}...")
 
     # unstructured supports fetching directly from url, but has no timeout
     # option, so use request ourselves with timeout.
     start_time = time.time()
-    response = requests.get(
+    response = session.get(
         url,
-        headers=headers,
         timeout=20,
         stream=True,
     )
 
-    # create a temporary file using a context manager
-    # close the file, use the name to open the file again
-    # https://docs.python.org/3/library/tempfile.html#examples
-    with tempfile.NamedTemporaryFile(delete_on_close=False) as fp:
-        print(f"Streaming HTML to temp file: {fp.name}")
-        shutil.copyfileobj(response.raw, fp)
-        fp.close()
-        end_time = time.time()
-        print(f"Downloading and saving took {(end_time - start_time):0.1f} seconds")
-        # the file is closed, but not removed
-        # open the file again by using its name
-        with open(fp.name, mode="rb") as f:
-            start_time = time.time()
-            elements = partition_html(file=f)
-            end_time = time.time()
-            print(f"Unstructured partitioning took {(end_time - start_time):0.1f} seconds")
-        with open(fp.name, mode="rb") as f:
-            # I cannot figure out how to get the HTML title using unstructured.
-            # So just use BeautifulSoup.
-            start_time = time.time()
-            page_title = extract_title_from_html(f.read())
-            end_time = time.time()
-            print(f"Extracting title took {(end_time - start_time):0.1f} seconds")
-    # file is now removed
+    if response.status_code in (429, 503):
+        # Back off from the whole site, for as long as it asks, if it says
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        response.close()
+        if retry_after:
+            block_domain(url, retry_after)
+        raise DeferFetch(f"HTTP {response.status_code} from {url}, Retry-After: {retry_after}", retry_after)
 
-    is_paywalled = False
-    for element in elements:
-        # See: https://docs.unstructured.io/api-reference/api-services/document-elements
-        element_text = str(element)
+    # Check what we're about to download before downloading it
+    content_kind = get_content_kind(response, url)
+    if content_kind is None:
+        print(f"Content-Type is {response.headers.get('Content-Type')}, not scraping it")
+        response.close()
+        return ("Unknown", "", False)
+    if content_kind == "pdf":
+        return fetch_pdf_content(url, response, start_time)
 
-        # print(f"Element ({type(element)}): ${element_text}")
+    content_length = response.headers.get("Content-Length")
+    if content_length and content_length.isdigit() and int(content_length) > SCRAPER_MAX_DOWNLOAD_BYTES:
+        print(f"Content-Length is {content_length}, only downloading the first {SCRAPER_MAX_DOWNLOAD_BYTES} bytes")
 
-        # Look out for text that indicates the article is paywalled. For this,
-        # we examine all element types, not just NarrativeText.
-        for paywall_text in PAYWALL_TEXTS:
-            if paywall_text in element_text:
-                print(f"Found paywall text '{paywall_text}'")
-                is_paywalled = True
-                break
+    html_bytes = download_capped(response, SCRAPER_MAX_DOWNLOAD_BYTES)
+    compressed_size = response.raw.tell()
+    end_time = time.time()
+    print(
+        f"Downloading {compressed_size} bytes ({len(html_bytes)} decompressed, "
+        f"Content-Encoding: {response.headers.get('Content-Encoding', 'none')}) "
+        f"took {(end_time - start_time):0.1f} seconds"
+    )
 
-        # Collect text from NarrativeText elements only, for now. Title seems to
-        # get too much garbage.
-        if isinstance(element, (NarrativeText,)):
-            body_pieces.append(element_text)
+    charset = get_charset(response, html_bytes)
+    print(f"Charset: {charset}")
+    html = html_bytes.decode(charset, errors="replace")
+
+    with parse_semaphore:
+        (extractor_name, extraction) = extract_article(html)
+    print(f"Extracted with: {extractor_name}")
+
+    # Look out for text that indicates the article is paywalled. For this,
+    # we examine all of the page's text, not just the narrative.
+    paywall_text = find_paywall_text(url, extraction.texts)
+    if paywall_text:
+        print(f"Found paywall text '{paywall_text}'")
+    is_paywalled = paywall_text is not None
 
-    content = "\n".join(body_pieces)
+    page_title = extraction.title
+    body_pieces = extraction.paragraphs
+    # Extractors stop once they have enough text, but the last paragraph can
+    # still run over
+    content = "\n".join(body_pieces)[:SCRAPER_MAX_CONTENT_CHARS]
     return (page_title, content, is_paywalled)
 
 
@@ -0,0 +1,71 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+import boto3
+from botocore.exceptions import BotoCoreError, ClientError
+from dailymail_shared.my_urls import canonicalize_url
+from app_settings import SUMMARIZER_BUCKET, SCRAPE_CACHE_PREFIX, SCRAPE_CACHE_DAYS
+
+# A client rather than a resource: records are scraped from a thread pool, and
+# only clients are thread safe
+s3 = boto3.client("s3")
+
+
+def get_canonical_url(record):
+    """Records from the rss_reader already carry their canonical url"""
+    return record.get("canonical_url") or canonicalize_url(record["url"])
+
+
+def get_cache_key(record):
+    """
+    Cache entries are keyed by the article's canonical url, so the same
+    article reached by a different url (tracking parameters, redirectors)
+    still hits.
+    """
+    canonical_url = get_canonical_url(record)
+    return SCRAPE_CACHE_PREFIX + hashlib.sha256(canonical_url.encode("utf-8")).hexdigest()
+
+
+def get_cached_scrape(record):
+    """
+    Returns the (title, content, is_paywalled) the url was last scraped to,
+    or None if it hasn't been scraped in the last SCRAPE_CACHE_DAYS. The cache
+    is only an optimization, so any trouble reading it is a miss.
+    """
+    key = get_cache_key(record)
+    try:
+        response = s3.get_object(Bucket=SUMMARIZER_BUCKET, Key=key)
+
+        # The bucket's lifecycle rule deletes old entries eventually, but only
+        # about daily, so check the age here too
+        age = datetime.now(timezone.utc) - response["LastModified"]
+        if age.total_seconds() > SCRAPE_CACHE_DAYS * 86400:
+            print(f"Scrape cache entry {key} is {age.days} days old, ignoring it")
+            return None
+
+        entry = json.loads(response["Body"].read().decode("utf-8"))
+        print(f"Scrape cache hit: {key}, scraped from {entry['url']}")
+        return (entry["title"], entry["content"], entry["is_paywalled"])
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "NoSuchKey":
+            print(f"Error reading scrape cache {key}: {e}")
+        return None
+    except (BotoCoreError, ValueError, KeyError) as e:
+        # e.g. a connection error, or a corrupt entry
+        print(f"Error reading scrape cache {key}: {e!r}")
+        return None
+
+
+def put_cached_scrape(record, title, content, is_paywalled):
+    key = get_cache_key(record)
+    entry = {
+        "url": record["url"],
+        "title": title,
+        "content": content,
+        "is_paywalled": is_paywalled,
+    }
+    try:
+        s3.put_object(Bucket=SUMMARIZER_BUCKET, Key=key, Body=json.dumps(entry))
+        print(f"Wrote scrape cache entry {key}")
+    except (BotoCoreError, ClientError) as e:
+        print(f"Error writing scrape cache {key}: {e}")
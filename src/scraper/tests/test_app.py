@@ -0,0 +1,38 @@
+import pytest
+import app
+from politeness import DeferFetch
+
+RECORD = {"type": "url", "url": "https://paywalled.example.com/a"}
+
+
+@pytest.fixture(name="calls")
+def fixture_calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(app, "get_domain_paywall_status", lambda url: "paywalled")
+    monkeypatch.setattr(app, "claim_paywall_reprobe", lambda url: calls.append("claim") or 1234)
+    monkeypatch.setattr(app, "release_paywall_reprobe", lambda url, claimed_at: calls.append(("release", claimed_at)))
+    monkeypatch.setattr(app, "record_paywall_outcome", lambda url, is_paywalled, reprobe: calls.append(("outcome", reprobe)))
+    monkeypatch.setattr(app, "put_cached_scrape", lambda *args: None)
+    monkeypatch.setattr(app, "get_cached_scrape", lambda record: None)
+    return calls
+
+
+def test_cache_hit_doesnt_use_up_the_reprobe(monkeypatch, calls):
+    monkeypatch.setattr(app, "get_cached_scrape", lambda record: ("Title", "", True))
+    app.scrape_url(dict(RECORD))
+    assert not calls
+
+
+def test_deferred_fetch_gives_the_reprobe_back(monkeypatch, calls):
+    def fetch(url):
+        raise DeferFetch("busy", 60)
+    monkeypatch.setattr(app, "fetch_site_content", fetch)
+    with pytest.raises(DeferFetch):
+        app.scrape_url(dict(RECORD))
+    assert calls == ["claim", ("release", 1234)]
+
+
+def test_reprobe_is_counted(monkeypatch, calls):
+    monkeypatch.setattr(app, "fetch_site_content", lambda url: ("Title", "", True))
+    app.scrape_url(dict(RECORD))
+    assert calls == ["claim", ("outcome", True)]
@@ -0,0 +1,16 @@
+import random
+from fingerprint import get_bands
+
+
+def test_fingerprints_within_max_distance_share_a_band():
+    random.seed(1)
+    for _ in range(1000):
+        a = random.getrandbits(64)
+        b = a
+        for bit in random.sample(range(64), random.randint(0, 6)):
+            b ^= 1 << bit
+        assert set(get_bands(a, 6, 2)) & set(get_bands(b, 6, 2))
+
+
+def test_settings_are_part_of_the_band():
+    assert not set(get_bands(0, 6, 2)) & set(get_bands(0, 3, 1))
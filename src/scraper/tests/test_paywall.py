@@ -0,0 +1,24 @@
+import json
+import paywall
+
+
+class FakeSSM:
+    def __init__(self, value):
+        self.value = value
+
+    def get_parameter(self, Name):
+        return {"Parameter": {"Value": json.dumps(self.value)}}
+
+
+def test_malformed_signatures_are_skipped(monkeypatch):
+    monkeypatch.setattr(paywall, "ssm", FakeSSM({
+        "example.com": "Subscribe",
+        "example.org": ["", "  ", 42, "Members only"],
+    }))
+    monkeypatch.setattr(paywall, "paywall_signatures", {"by_domain": {}, "loaded_at": 0, "regexes": {}})
+    signatures = paywall.load_paywall_signatures()
+    assert "example.com" not in signatures
+    assert signatures["example.org"] == ["Members only"]
+    assert paywall.find_paywall_text("https://example.com/a", ["An ordinary article"]) is None
+    assert paywall.find_paywall_text("https://example.org/a", ["An ordinary article"]) is None
+    assert paywall.find_paywall_text("https://example.org/a", ["Members only beyond here"]) == "Members only"
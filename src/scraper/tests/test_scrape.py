@@ -0,0 +1,55 @@
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NameResolutionError, NewConnectionError
+import scrape
+from politeness import DeferFetch
+from scrape import Extraction, extract_article, extract_with_lxml
+
+PARAGRAPH = "The council voted on Tuesday to approve the new budget for the coming year. " * 3
+
+
+def fake_unstructured(html):
+    return Extraction("From unstructured", ["fallback"], ["fallback"], 1.0)
+
+
+def test_xhtml_with_encoding_declaration():
+    html = (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<html xmlns="http://www.w3.org/1999/xhtml"><head><title>Budget</title></head>'
+        f"<body><article><p>{PARAGRAPH}</p><p>{PARAGRAPH}</p></article></body></html>"
+    )
+    extraction = extract_with_lxml(html)
+    assert extraction.title == "Budget"
+    assert extraction.paragraphs == [PARAGRAPH.strip(), PARAGRAPH.strip()]
+
+
+def test_comment_only_page_falls_back(monkeypatch):
+    monkeypatch.setattr(scrape, "SCRAPER_EXTRACTOR", "fast")
+    monkeypatch.setitem(scrape.EXTRACTORS, "unstructured", fake_unstructured)
+    (name, extraction) = extract_article("<!-- nothing to see here -->")
+    assert name == "unstructured"
+    assert extraction.title == "From unstructured"
+
+
+def fail_with(monkeypatch, error):
+    def fetch_and_extract(url):
+        raise error
+    monkeypatch.setattr(scrape, "wait_for_domain", lambda url: None)
+    monkeypatch.setattr(scrape, "fetch_and_extract", fetch_and_extract)
+
+
+def test_refused_connection_is_deferred(monkeypatch):
+    reason = NewConnectionError(None, "Connection refused")
+    fail_with(monkeypatch, requests.exceptions.ConnectionError(MaxRetryError(None, "/", reason)))
+    with pytest.raises(DeferFetch):
+        scrape.fetch_site_content("https://example.com/a")
+
+
+@pytest.mark.parametrize("error", [
+    requests.exceptions.SSLError("certificate verify failed"),
+    requests.exceptions.ConnectionError(MaxRetryError(None, "/", NameResolutionError("example.com", None, "no such host"))),
+])
+def test_tls_and_dns_failures_fail_right_away(monkeypatch, error):
+    fail_with(monkeypatch, error)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        scrape.fetch_site_content("https://example.com/a")
@@ -0,0 +1,27 @@
+import io
+from datetime import datetime, timezone
+import scrape_cache
+
+
+class FakeS3:
+    def __init__(self, body):
+        self.body = body
+
+    def get_object(self, Bucket, Key):
+        return {"LastModified": datetime.now(timezone.utc), "Body": io.BytesIO(self.body)}
+
+
+def test_corrupt_entry_is_a_miss(monkeypatch):
+    monkeypatch.setattr(scrape_cache, "s3", FakeS3(b'{"url": "https://example.com/a", "tit'))
+    assert scrape_cache.get_cached_scrape({"url": "https://example.com/a"}) is None
+
+
+def test_entry_missing_fields_is_a_miss(monkeypatch):
+    monkeypatch.setattr(scrape_cache, "s3", FakeS3(b'{"url": "https://example.com/a"}'))
+    assert scrape_cache.get_cached_scrape({"url": "https://example.com/a"}) is None
+
+
+def test_hit(monkeypatch):
+    body = b'{"url": "https://example.com/a", "title": "A", "content": "Text", "is_paywalled": false}'
+    monkeypatch.setattr(scrape_cache, "s3", FakeS3(body))
+    assert scrape_cache.get_cached_scrape({"url": "https://example.com/a"}) == ("A", "Text", False)
@@ -2,6 +2,7 @@ import json
 from app_s3 import read_from_s3, delete_from_s3
 from app_queue import enqueue
 from app_settings import SUMMARIZER_BUCKET, DIGEST_QUEUE
+from dailymail_shared.my_summarizer_bucket import INLINE_MESSAGE_TYPE, RECORD_VERSION
 from google_alerts import is_google_alert, get_topic_from_google_alert_title
 from summarize import summarize_text, summarize_google_alert
 
@@ -10,8 +11,15 @@ def process_sqs_record(sqs_record):
     # print(sqs_record)
     if not "eventSource" in sqs_record or sqs_record["eventSource"] != "aws:sqs":
         raise Exception("Not an SQS event")
-    s3_records = json.loads(sqs_record["body"])
-    for s3_record in s3_records["Records"]:
+    body = json.loads(sqs_record["body"])
+    # Small records are sent on the queue themselves (see send_to_summarizer),
+    # larger ones arrive as S3 notifications for objects in incoming/
+    if body.get("type") == INLINE_MESSAGE_TYPE:
+        if body.get("version", 0) > RECORD_VERSION:
+            raise Exception(f"Record version {body['version']} is newer than this code understands ({RECORD_VERSION})")
+        process_record(body["record"], f"message {sqs_record['messageId']}")
+        return
+    for s3_record in body["Records"]:
         process_s3_record(s3_record)
 
 
@@ -22,13 +30,23 @@ def process_s3_record(s3_record):
 
     key = s3_record["s3"]["object"]["key"]
     record = json.loads(read_from_s3(SUMMARIZER_BUCKET, key))
+    if process_record(record, key):
+        delete_from_s3(SUMMARIZER_BUCKET, key)
+
+
+def process_record(record, key):
+    """
+    Summarize the record and send it on to the digest. key identifies where
+    the record came from, for the logs. Returns False if there was nothing
+    to summarize.
+    """
     # records with type=rss_entry have fields: feed_title, feed_description, url, published, title, content
     # print(record)
 
     # STOP if there is no content
     if "content" not in record or record["content"] == "":
         print(f"No content for {key}")
-        return
+        return False
 
     feed_context = record.get("feed_context")
     
@@ -56,6 +74,5 @@ def process_s3_record(s3_record):
     else:
         enqueue(DIGEST_QUEUE, json.dumps(record))
 
-    delete_from_s3(SUMMARIZER_BUCKET, key)
-
     print(f"Successfully summarized content for {key}")
+    return True
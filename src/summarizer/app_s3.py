@@ -1,10 +1,13 @@
 import boto3
+from dailymail_shared.my_summarizer_bucket import decode_record_body
 
 s3 = boto3.resource("s3")
 
 
 def read_from_s3(bucket_name, key):
-    return s3.Object(bucket_name, key).get()['Body'].read().decode('utf-8')
+    # Records are gzipped (see write_to_summarizer_bucket), older ones not
+    response = s3.Object(bucket_name, key).get()
+    return decode_record_body(response['Body'].read(), response.get('ContentEncoding'), response.get('Metadata'))
 
 def delete_from_s3(bucket_name, key):
     s3.Object(bucket_name, key).delete()
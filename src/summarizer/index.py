@@ -7,17 +7,31 @@ from app import process_sqs_record
 def handler(event, context):  # pylint: disable=unused-argument,redefined-outer-name
     try:
         show_settings()
+        # Report just the records that failed, so the rest of the batch isn't
+        # redelivered: inline records would be summarized (and digested) again
+        failed = []
         for record in event["Records"]:
-            process_sqs_record(record)
+            try:
+                process_sqs_record(record)
+            except Exception as e:
+                print(f"Exception processing record {record['messageId']}: {e}")
+                dump_stack_trace()
+                failed.append(record["messageId"])
+        return { "batchItemFailures": [{"itemIdentifier": f} for f in failed] } if failed else {}
 
     except Exception as e:
-        stack_trace = traceback.format_exc()
-        print("=== BEGIN stack trace ===")
-        print(stack_trace)
-        print("=== END stack trace ===")
+        print(f"Exception: {e}")
+        dump_stack_trace()
         raise e
 
 
+def dump_stack_trace():
+    stack_trace = traceback.format_exc()
+    print("=== BEGIN stack trace ===")
+    print(stack_trace)
+    print("=== END stack trace ===")
+
+
 if __name__ == "__main__":
     with open("misc/example-event.json", "r", encoding="utf-8") as f:
         event = json.load(f)